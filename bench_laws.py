@@ -0,0 +1,252 @@
+import io
+import os
+import re
+import json
+import time
+import timeit
+import argparse
+import platform
+import statistics
+from laws_engine import (
+    LAWS_DIR,
+    LawIndex,
+    MappedLawIndex,
+    corpus_signature,
+    iter_docx_paragraphs,
+    list_law_files,
+    load_corpus,
+    match_query,
+    normalize_arabic_text,
+    normalize_arabic_texts,
+    parse_query,
+    query_keywords,
+    search_laws,
+    highlight_fuzzy,
+    highlight_keywords,
+    highlight_stems,
+    read_docx_paragraphs,
+    segment_articles,
+    split_keywords,
+    write_mapped_index,
+    write_results_docx,
+)
+
+# ----------------------------------------------------
+# قياس أداء محرك القوانين على ملفات laws/ الفعلية
+# الاستخدام:
+#   python bench_laws.py                         كل المراحل على المجموعة الأصلية
+#   python bench_laws.py --scale 1 10 100        مع مجموعات مضخمة صناعيًا
+#   python bench_laws.py --json run.json         حفظ النتائج للمقارنة لاحقًا
+#   python bench_laws.py --compare old.json      مقارنة بتشغيل سابق
+# فحوص الصحة في tests/ (python -m pytest)
+# ----------------------------------------------------
+
+# مجموعة استعلامات ثابتة: كلمات قصيرة، عبارات طويلة، كلمات كثيرة، وأرقام مواد بأرقام عربية
+QUERIES = [
+    {"name": "short_term", "keywords": "عقد"},
+    {"name": "short_term_2", "keywords": "زوج"},
+    {"name": "two_letters", "keywords": "حق"},
+    {"name": "hamza_variant", "keywords": "إلتزام"},
+    {"name": "phrase", "keywords": "المحكمة المختصة"},
+    {"name": "long_phrase", "keywords": "يجوز للمحكمة أن تأمر بإحالة الدعوى إلى النيابة العامة"},
+    {"name": "many_keywords", "keywords": "عقد, زوج, طلاق, نفقة, حضانة, ميراث, وصية, هبة, بيع, إيجار"},
+    {"name": "article_arabic_digits", "article": "١٠"},
+    {"name": "article_arabic_digits_3", "article": "١٢٥"},
+    {"name": "article_and_keyword", "keywords": "المحكمة", "article": "٥"},
+    {"name": "no_match", "keywords": "كلمةغيرموجودةاطلاقا"},
+    {"name": "boolean_and_not", "keywords": "عقد AND بيع NOT إيجار", "boolean": True},
+    {"name": "boolean_phrase_or", "keywords": '"المحكمة المختصة" AND (دعوى OR طلب) NOT استئناف', "boolean": True},
+    {"name": "boolean_near", "keywords": "الدعوى NEAR/5 النيابة", "boolean": True},
+    {"name": "stem", "keywords": "عقد, المحكمة المختصة", "morphology": "stem"},
+    {"name": "root", "keywords": "العقود", "morphology": "root"},
+    {"name": "fuzzy_typo", "keywords": "الحظانة, المسؤلية", "fuzzy": True},
+    {"name": "fuzzy_short", "keywords": "عقد", "fuzzy": True},
+]
+
+
+def legacy_normalize_arabic_text(text):
+    """النسخة الأصلية من normalize_arabic_text (تسع عمليات re.sub) للمقارنة فقط"""
+    text = re.sub(r'(.)\1{2,}', r'\1', text)
+    text = re.sub(r'[\u064B-\u0652]', '', text)
+    text = re.sub('[إأآا]', 'ا', text)
+    text = re.sub('[ىي]', 'ي', text)
+    text = re.sub('[ة]', 'ه', text)
+    text = re.sub('ؤ', 'و', text)
+    text = re.sub('ئ', 'ي', text)
+    text = re.sub(r'[^\w\s]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def measure(fn, repeat=5):
+    """أزمنة التنفيذ بالمللي ثانية: الأدنى (للمقارنة) والوسيط"""
+    times = timeit.repeat(fn, number=1, repeat=repeat)
+    return {"min_ms": round(min(times) * 1000, 3), "median_ms": round(statistics.median(times) * 1000, 3)}
+
+
+def corpus_texts(corpus=None):
+    if corpus is None:
+        corpus, _ = load_corpus()
+    return ["\n".join(paragraphs) for entry in corpus["laws"].values() for _, paragraphs, _ in entry["articles"]]
+
+
+def scaled_corpus(corpus, factor):
+    """مجموعة صناعية مكررة factor مرة بأسماء ملفات مختلفة، لقياس سلوك الفهرس مع الحجم"""
+    if factor == 1:
+        return corpus
+    laws = {}
+    for i in range(factor):
+        for file, entry in corpus["laws"].items():
+            laws[f"{i:03d}_{file}"] = dict(entry, sha1=f"{entry['sha1']}-{i}")
+    return dict(corpus, laws=laws)
+
+
+def bench_normalize(texts, repeat=5):
+    cases = {
+        "legacy_normalize_arabic_text": lambda: [legacy_normalize_arabic_text(t) for t in texts],
+        "normalize_arabic_text": lambda: [normalize_arabic_text(t) for t in texts],
+        "normalize_arabic_texts": lambda: normalize_arabic_texts(texts),
+    }
+    return {name: measure(fn, repeat) for name, fn in cases.items()}
+
+
+def bench_docx(laws_dir=LAWS_DIR, repeat=3):
+    """قراءة ملفات DOCX وتقسيمها إلى مواد، كل مرحلة على حدة"""
+    paths = [os.path.join(laws_dir, f) for f in list_law_files(laws_dir)]
+    paragraphs = [list(read_docx_paragraphs(p)) for p in paths]
+    return {
+        "files": len(paths),
+        "paragraphs": sum(map(len, paragraphs)),
+        "docx_load": measure(lambda: [sum(1 for _ in iter_docx_paragraphs(p)) for p in paths], repeat),
+        "segment_articles": measure(lambda: [sum(1 for _ in segment_articles(p)) for p in paragraphs], repeat),
+    }
+
+
+def bench_queries(index, repeat=5):
+    """لكل استعلام: المطابقة التامة والجزئية، التمييز، البحث كاملًا، والتصدير إلى Word"""
+    out = {}
+    for query in QUERIES:
+        boolean = query.get("boolean", False)
+        morphology = query.get("morphology")
+        fuzzy = query.get("fuzzy", False)
+        keywords = [query["keywords"]] if boolean else split_keywords(query.get("keywords", ""))
+        article = query.get("article", "")
+        terms = query_keywords(parse_query(keywords[0])) if boolean else keywords
+        normalized = [normalize_arabic_text(kw) for kw in terms]
+        row = {}
+        if morphology or fuzzy:
+            row["match_stems" if morphology else "match_fuzzy"] = measure(
+                lambda: match_query(index, ("or", [("phrase", tuple(kw.split()), kw, False) for kw in normalized]),
+                                    morphology=morphology, fuzzy=fuzzy), repeat)
+        elif boolean:
+            row["match_exact"] = measure(lambda: match_query(index, parse_query(keywords[0]), exact_match=True), repeat)
+            row["match_partial"] = measure(lambda: match_query(index, parse_query(keywords[0]), exact_match=False), repeat)
+        elif normalized:
+            row["match_exact"] = measure(lambda: index.match_keywords(normalized, exact_match=True), repeat)
+            row["match_partial"] = measure(lambda: index.match_keywords(normalized, exact_match=False), repeat)
+        options = {"boolean": boolean, "morphology": morphology, "fuzzy": fuzzy}
+        results, total = search_laws(index, None, keywords, article, **options)
+        row["results"] = total
+        row["search"] = measure(lambda: search_laws(index, None, keywords, article, **options), repeat)
+        row["search_ranked"] = measure(lambda: search_laws(index, None, keywords, article, rank=True, **options), repeat)
+        if morphology:
+            plain = [r["plain"] for r in results]
+            row["highlight_stems"] = measure(lambda: [highlight_stems(t, terms, morphology) for t in plain], repeat)
+        elif fuzzy:
+            plain = [r["plain"] for r in results]
+            row["highlight_fuzzy"] = measure(lambda: [highlight_fuzzy(t, terms) for t in plain], repeat)
+        elif terms:
+            plain = [r["plain"] for r in results]
+            row["highlight_keywords"] = measure(
+                lambda: [highlight_keywords(t, terms, normalized_keywords=normalized) for t in plain], repeat)
+        row["export_docx"] = measure(lambda: write_results_docx(results, io.BytesIO()), repeat)
+        out[query["name"]] = row
+    return out
+
+
+def environment(corpus):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "corpus": [list(item) for item in corpus_signature(corpus)],
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(scales=(1,), repeat=5):
+    corpus, errors = load_corpus()
+    report = {"environment": environment(corpus), "errors": errors}
+    report["docx"] = bench_docx(repeat=max(1, repeat // 2))
+    report["normalize"] = bench_normalize(corpus_texts(corpus), repeat)
+    report["scales"] = {}
+    for factor in scales:
+        scaled = scaled_corpus(corpus, factor)
+        start = time.perf_counter()
+        index = LawIndex(scaled)
+        build_ms = round((time.perf_counter() - start) * 1000, 3)
+        scale = report["scales"][str(factor)] = {
+            "articles": index.article_count,
+            "index_build": {"min_ms": build_ms, "median_ms": build_ms},
+            "queries": bench_queries(index, repeat if factor < 100 else 1),
+        }
+        # الفهرس الثنائي: الكتابة مرة، ثم الفتح بـ mmap والاستعلام منه مباشرة
+        index_file = f"bench_index_{factor}.bin"
+        try:
+            start = time.perf_counter()
+            write_mapped_index(index, index_file)
+            write_ms = round((time.perf_counter() - start) * 1000, 3)
+            scale["mapped_write"] = {"min_ms": write_ms, "median_ms": write_ms}
+            del index, scaled
+            scale["mapped_open"] = measure(lambda: MappedLawIndex(index_file), repeat)
+            scale["mapped_queries"] = bench_queries(MappedLawIndex(index_file), repeat if factor < 100 else 1)
+        finally:
+            if os.path.exists(index_file):
+                os.remove(index_file)
+    return report
+
+
+def _flatten(data, prefix=""):
+    """مسارات min_ms فقط، مثل scales/1/queries/phrase/search"""
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            if "min_ms" in value:
+                flat[prefix + key] = value["min_ms"]
+            else:
+                flat.update(_flatten(value, f"{prefix}{key}/"))
+    return flat
+
+
+def compare(old, new):
+    """نسبة الزمن الجديد إلى القديم لكل قياس مشترك (أقل من 1 = أسرع)"""
+    old_flat, new_flat = _flatten(old), _flatten(new)
+    return {key: round(new_flat[key] / old_flat[key], 3) if old_flat[key] else None
+            for key in new_flat if key in old_flat}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench_laws", description="قياس أداء محرك القوانين")
+    parser.add_argument("repeat", nargs="?", type=int, default=5, help="عدد التكرارات لكل قياس")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1], help="أحجام المجموعة الصناعية (مثل 1 10 100)")
+    parser.add_argument("--json", help="حفظ النتائج في ملف JSON")
+    parser.add_argument("--compare", help="ملف JSON من تشغيل سابق للمقارنة")
+    args = parser.parse_args(argv)
+
+    report = run(args.scale, args.repeat)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    for key, ms in _flatten(report).items():
+        print(f"{key:70} {ms:10.3f} ms")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            ratios = compare(json.load(f), report)
+        print("\nالنسبة إلى التشغيل السابق (أقل من 1 = أسرع):")
+        for key, ratio in ratios.items():
+            print(f"{key:70} x{ratio}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,256 @@
+import json
+import socket
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs
+from laws_engine import (
+    CORPUS_FILE,
+    INDEX_FILE,
+    LAWS_DIR,
+    TOP_K_RESULTS,
+    LiveLawIndex,
+    QueryCache,
+    cached_search_laws,
+    find_articles,
+    list_laws,
+    resolve_law,
+    split_keywords,
+)
+
+# ----------------------------------------------------
+# واجهة HTTP للبحث في القوانين: JSON فوق http.server من المكتبة القياسية
+# الاستخدام: python laws_api.py [--host 127.0.0.1] [--port 8502] [--threads 8]
+#
+#   GET  /laws                                  قائمة القوانين وعدد موادها
+#   GET  /search?q=كلمة,كلمة&law=&article=&exact=1&rank=1&top_k=50&highlight=1
+#   GET  /search?q="عبارة" AND كلمة NOT كلمة&boolean=1   استعلام منطقي (انظر parse_query)
+#   GET  /search?q=عقد&morphology=stem            بحث صرفي بالجذع (stem) أو الجذر التقريبي (root)
+#   GET  /search?q=الحظانة&fuzzy=1                بحث تقريبي يتحمل الأخطاء الإملائية
+#   POST /search   {"keywords": "...", "law": "...", "article": "...", ...}
+#   GET  /article?num=١٠&law=                   مادة برقمها
+#   GET  /health                                حالة الفهرس وعدادات الذاكرة المؤقتة
+#
+# كل مادة في النتائج تحمل cites (المواد التي تحيل هي إليها من القانون نفسه) و cited_by (المواد التي تحيل إليها).
+# ----------------------------------------------------
+
+API_HOST = "127.0.0.1"
+API_PORT = 8502
+API_THREADS = 8  # عدد الطلبات التي تُعالج في وقت واحد
+MAX_BODY_SIZE = 64 * 1024
+IDLE_TIMEOUT = 5  # ثوانٍ: اتصال keep-alive خامل يُغلق بعدها فلا يحجز خيطًا من المجمّع
+API_LOGGER = logging.getLogger("laws_api")
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """خادم HTTP يعالج الطلبات من مجمّع خيوط بحجم ثابت بدل خيط جديد لكل طلب"""
+
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class, live_index, threads=API_THREADS):
+        super().__init__(server_address, handler_class)
+        self.live_index = live_index
+        self.query_cache = QueryCache()
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="laws-api")
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._connections_lock:
+            self._connections.add(request)
+        self.pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(request)
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # الاتصالات الخاملة تنتظر الطلب التالي: إغلاقها للقراءة يوقظها فتنتهي خيوطها دون انتظار المهلة
+        with self._connections_lock:
+            connections = list(self._connections)
+        for request in connections:
+            try:
+                request.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        self.pool.shutdown(wait=True)
+
+
+def _flag(value):
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def _text(params, name):
+    """معامل نصي من الطلب: الأعداد (في جسم JSON) تُقبل كنص، وأي نوع آخر خطأ"""
+    value = params.get(name)
+    if value is None:
+        return ""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    if not isinstance(value, str):
+        raise ValueError(f"{name} يجب أن يكون نصًا أو رقمًا")
+    return value
+
+
+def _positive_int(params, name, default):
+    value = params.get(name, default)
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f"{name} يجب أن يكون عددًا صحيحًا موجبًا")
+    return value
+
+
+class LawsAPIHandler(BaseHTTPRequestHandler):
+    server_version = "LawsAPI/1.0"
+    protocol_version = "HTTP/1.1"
+    timeout = IDLE_TIMEOUT
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _search(self, index, params):
+        keywords = params.get("keywords", params.get("q", ""))
+        boolean = _flag(params.get("boolean", False))
+        if isinstance(keywords, str):
+            keywords = [keywords] if boolean else split_keywords(keywords)
+        else:
+            if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+                raise ValueError("keywords يجب أن تكون نصًا أو قائمة نصوص")
+            keywords = [k.strip() for k in keywords if k.strip()]
+        results, total_matches = cached_search_laws(
+            self.server.query_cache,
+            index,
+            resolve_law(index, _text(params, "law")),
+            keywords,
+            _text(params, "article"),
+            exact_match=_flag(params.get("exact", False)),
+            rank=_flag(params.get("rank", False)),
+            top_k=_positive_int(params, "top_k", TOP_K_RESULTS),
+            highlight=_flag(params.get("highlight", False)),
+            boolean=boolean,
+            morphology=_text(params, "morphology") or None,
+            fuzzy=_flag(params.get("fuzzy", False)),
+        )
+        if not _flag(params.get("highlight", False)):
+            results = [{k: v for k, v in r.items() if k != "text"} for r in results]
+        return {"total_matches": total_matches, "results": results}
+
+    def _dispatch(self, path, params):
+        # كل طلب يأخذ النسخة الحالية من الفهرس ويبقى عليها حتى ينتهي
+        index = self.server.live_index.current
+        if path == "/search":
+            return self._search(index, params)
+        if path == "/article":
+            number = _text(params, "num")
+            if not number.strip():
+                raise ValueError("num مطلوب")
+            return find_articles(index, number, resolve_law(index, _text(params, "law")))
+        if path == "/laws":
+            return {"laws": list_laws(index), "errors": index.errors}
+        if path == "/health":
+            return {"laws": len(index.files), "articles": index.article_count, "cache": self.server.query_cache.stats(),
+                    "watch_error": self.server.live_index.last_error}
+        return None
+
+    def _handle(self, path, params):
+        try:
+            data = self._dispatch(path, params)
+        except KeyError as e:
+            self._send_json({"error": f"القانون غير موجود: {e.args[0]}"}, 404)
+        except (ValueError, TypeError) as e:
+            self._send_json({"error": str(e)}, 400)
+        except Exception:
+            # خطأ في المعالجة نفسها: العميل يتلقى ردًا بدل اتصال مقطوع، والتفاصيل في السجل
+            API_LOGGER.exception("خطأ في معالجة %s", path)
+            self._send_json({"error": "خطأ داخلي في الخادم"}, 500)
+        else:
+            if data is None:
+                self._send_json({"error": "المسار غير موجود"}, 404)
+            else:
+                self._send_json(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self._handle(url.path, params)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_SIZE:
+            # الجسم لم يُقرأ فلا يمكن متابعة الاتصال نفسه بطلب آخر
+            self.close_connection = True
+            if length < 0:
+                self._send_json({"error": "Content-Length غير صالح"}, 400)
+            else:
+                self._send_json({"error": "حجم الطلب كبير جدًا"}, 413)
+            return
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json({"error": "JSON غير صالح"}, 400)
+            return
+        if not isinstance(params, dict):
+            self._send_json({"error": "يجب أن يكون جسم الطلب كائن JSON"}, 400)
+            return
+        self._handle(url.path, params)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=API_HOST, port=API_PORT, threads=API_THREADS, laws_dir=LAWS_DIR, corpus_file=CORPUS_FILE,
+                workers=None, index_file=INDEX_FILE):
+    """خادم جاهز على فهرس حي واحد تتشاركه كل الطلبات؛ مع index_file يُفتح الفهرس الثنائي بـ mmap
+    فتتشارك عدة عمليات للخادم صفحات الملف نفسها"""
+    live_index = LiveLawIndex(laws_dir, corpus_file, workers, index_file).start()
+    return ThreadPoolHTTPServer((host, port), LawsAPIHandler, live_index, threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="laws_api", description="واجهة HTTP (JSON) للبحث في القوانين اليمنية")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--threads", type=int, default=API_THREADS, help="عدد الطلبات المتزامنة")
+    parser.add_argument("--laws-dir", default=LAWS_DIR)
+    parser.add_argument("--corpus-file", default=CORPUS_FILE)
+    parser.add_argument("--workers", type=int, default=None, help="عدد العمليات عند تحليل الملفات")
+    parser.add_argument("--index-file", default=INDEX_FILE, help="الفهرس الثنائي المفتوح بـ mmap")
+    parser.add_argument("--no-mmap", action="store_true", help="بناء الفهرس في الذاكرة بدل الفهرس الثنائي")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.threads, args.laws_dir, args.corpus_file, args.workers,
+                         None if args.no_mmap else args.index_file)
+    print(f"http://{args.host}:{args.port}/ ({args.threads} خيوط)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.live_index.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
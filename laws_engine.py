@@ -0,0 +1,2898 @@
+import os
+import re
+import sys
+import argparse
+import contextlib
+import logging
+import time
+import json
+import hashlib
+import bisect
+import functools
+import heapq
+import math
+import mmap
+import struct
+import tempfile
+import threading
+import zipfile
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from html import escape as html_escape
+from xml.sax.saxutils import escape as xml_escape
+from lxml import etree
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ----------------------------------------------------
+# محرك القوانين: قراءة ملفات DOCX وتقسيمها إلى مواد وحفظها في ملف مجمّع
+# ----------------------------------------------------
+
+LAWS_DIR = "laws"
+CORPUS_FILE = "laws_corpus.json"
+CORPUS_VERSION = 1
+WATCH_INTERVAL = 2.0  # ثوانٍ بين كل فحص لمجلد القوانين
+WATCH_LOGGER = logging.getLogger("laws_engine.watch")
+TOP_K_RESULTS = 50  # عدد النتائج المعروضة عند الترتيب حسب الأهمية
+QUERY_CACHE_SIZE = 256  # أقصى عدد من الاستعلامات المحفوظة نتائجها
+UNKNOWN_ARTICLE = "غير معروفة"
+ARTICLE_RE = re.compile(r"مادة\s*[\(]?\s*(\d+)[\)]?")
+
+
+ARABIC_DIGITS_TABLE = str.maketrans('٠١٢٣٤٥٦٧٨٩', '0123456789')
+
+# تكرار الحرف نفسه ثلاث مرات أو أكثر يُختصر إلى حرف واحد
+_REPEATED_CHAR_RE = re.compile(r'(.)\1\1+')
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_ASTRAL_RE = re.compile('[\U00010000-\U0010FFFF]')
+# فاصل داخلي للتطبيع الجماعي: محاط بسطرين حتى لا يدخل في تكرار الأحرف
+_BATCH_SENTINEL = '\ufdd0'
+_BATCH_SEPARATOR = '\n' + _BATCH_SENTINEL + '\n'
+_ARABIC_LETTERS_MAP = {'إ': 'ا', 'أ': 'ا', 'آ': 'ا', 'ى': 'ي', 'ة': 'ه', 'ؤ': 'و', 'ئ': 'ي'}
+
+
+def _build_normalize_table():
+    """
+    جدول تحويل لـ str.translate يغطي أحرف BMP ويجمع في خطوة واحدة:
+    حذف التشكيل، توحيد الألف والياء والتاء المربوطة والهمزات، وحذف الرموز (غير \\w و \\s).
+    """
+    table = []
+    for cp in range(0x10000):
+        ch = chr(cp)
+        table.append('' if _NON_WORD_RE.match(ch) else ch)
+    for cp in range(0x064B, 0x0653):
+        table[cp] = ''
+    for src, dst in _ARABIC_LETTERS_MAP.items():
+        table[ord(src)] = dst
+    return table
+
+
+_NORMALIZE_TABLE = _build_normalize_table()
+_BATCH_TABLE = list(_NORMALIZE_TABLE)
+_BATCH_TABLE[ord(_BATCH_SENTINEL)] = '\x00'
+
+
+def _drop_astral_symbols(text):
+    # الجدول لا يغطي الأحرف خارج BMP (مثل الرموز التعبيرية) فتُحذف الرموز منها هنا
+    if _ASTRAL_RE.search(text):
+        return _NON_WORD_RE.sub('', text)
+    return text
+
+
+def normalize_arabic_numbers(text):
+    return text.translate(ARABIC_DIGITS_TABLE)
+
+
+def normalize_arabic_text(text):
+    text = _REPEATED_CHAR_RE.sub(r'\1', text)
+    text = _drop_astral_symbols(text.translate(_NORMALIZE_TABLE))
+    return ' '.join(text.split())
+
+
+def normalize_arabic_texts(texts):
+    """
+    تطبيع مجموعة نصوص دفعة واحدة بنفس نتيجة normalize_arabic_text لكل نص،
+    بدمجها في نص واحد تمر عليه خطوات التطبيع مرة واحدة ثم تقسيمه من جديد.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    if any(_BATCH_SENTINEL in t for t in texts):
+        return [normalize_arabic_text(t) for t in texts]
+    joined = _REPEATED_CHAR_RE.sub(r'\1', _BATCH_SEPARATOR.join(texts))
+    parts = joined.translate(_BATCH_TABLE).split('\x00')
+    if _ASTRAL_RE.search(joined):
+        parts = [_drop_astral_symbols(part) for part in parts]
+    return [' '.join(part.split()) for part in parts]
+
+
+# ----------------------------------------------------
+# تجذيع خفيف للكلمات المطبّعة (بعد normalize_arabic_text) للبحث الصرفي:
+# تُحذف أداة التعريف وما يسبقها، ثم لاحقة الضمير (أو التاء المربوطة بعد "ال" لأن المعرّف لا يُضاف إلى ضمير)،
+# ثم لاحقة الجمع أو التثنية، ثم ياء النسبة.
+# الحروف المفردة (و ف ب ل ك) لا تُحذف عند الفهرسة حتى لا تتشوه كلمات مثل "وصيه" و "بطاقه"،
+# بل يُبحث عنها عند الاستعلام (stem_variants): جذع "عقد" يشمل "بعقد" و "وعقد" ...
+# الجذر التقريبي يحذف حروف المد (ا و ي) بعد الحرف الأول ليجمع الجموع المكسرة: "عقود" ← "عقد".
+# ----------------------------------------------------
+
+MORPHOLOGY_MODES = ("stem", "root")
+# الأطول أولًا: "وبالعقد" ← "عقد" و "وللمحكمه" ← "محكمه"
+_STEM_ARTICLES = ("وبال", "فبال", "وكال", "فكال", "وال", "فال", "بال", "كال", "ولل", "فلل", "لل", "ال")
+_STEM_PRONOUN_SUFFIXES = ("هما", "كما", "ها", "هم", "كم", "نا", "ه")
+_STEM_PLURAL_SUFFIXES = ("ات", "ون", "ين", "ان")
+_STEM_CLITICS = "وفبلك"
+_STEM_MIN_LENGTH = 3
+_STEM_MIN_PLURAL_WORD = 6  # لواحق الجمع والتثنية تُحذف من الكلمات الطويلة فقط ("قانون" تبقى كما هي)
+
+
+def light_stem(token):
+    """جذع كلمة مطبّعة واحدة، مثل: "المحكمه" و "محكمه" ← "محكم"، "العقود" ← "عقود"، "القانونيه" ← "قانون" """
+    definite = False
+    for prefix in _STEM_ARTICLES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            token = token[len(prefix):]
+            definite = True
+            break
+    if definite and token.startswith("ال") and len(token) - 2 >= _STEM_MIN_LENGTH:
+        token = token[2:]  # "الالتزام" ← "التزام" ← "تزام" كما في "التزام" دون تعريف
+    suffixes = ("ه",) if definite else _STEM_PRONOUN_SUFFIXES
+    for suffix in suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _STEM_MIN_LENGTH:
+            token = token[:-len(suffix)]
+            break
+    if len(token) >= _STEM_MIN_PLURAL_WORD:
+        for suffix in _STEM_PLURAL_SUFFIXES:
+            if token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+    if token.endswith("ي") and len(token) - 1 >= _STEM_MIN_LENGTH:
+        token = token[:-1]
+    return token
+
+
+def approximate_root(token):
+    """جذر تقريبي: جذع الكلمة دون حروف المد بعد حرفه الأول إن بقي منه ثلاثة أحرف على الأقل"""
+    return _stem_root(light_stem(token))
+
+
+def _stem_root(stem):
+    if len(stem) <= _STEM_MIN_LENGTH:
+        return stem
+    root = stem[0] + "".join(c for c in stem[1:] if c not in "اوي")
+    return root if len(root) >= _STEM_MIN_LENGTH else stem
+
+
+def stem_variants(stem):
+    """
+    مفاتيح البحث لجذع من الاستعلام: الجذع نفسه ومع كل حرف متصل، ودونه إن بدأ بأحدها،
+    ومع التاء المفتوحة التي تبقى من التاء المربوطة قبل الضمير ("محكمتها" ← "محكمت").
+    """
+    variants = [stem, stem + "ت"] + [clitic + stem for clitic in _STEM_CLITICS]
+    if stem[:1] in _STEM_CLITICS and len(stem) > _STEM_MIN_LENGTH:
+        variants.append(stem[1:])
+    return list(dict.fromkeys(variants))
+
+
+def morphology_key(token, morphology):
+    """جذع الكلمة المطبّعة أو جذرها التقريبي حسب morphology ("stem" أو "root")"""
+    return approximate_root(token) if morphology == "root" else light_stem(token)
+
+
+def morphology_keys(word, morphology):
+    """مفاتيح الفهرس الصرفي لكلمة من الاستعلام: صيغ جذعها (stem_variants)، أو جذور هذه الصيغ مع root"""
+    variants = stem_variants(light_stem(word))
+    if morphology == "root":
+        return list(dict.fromkeys(_stem_root(stem) for stem in variants))
+    return variants
+
+
+# ----------------------------------------------------
+# البحث التقريبي (يتحمل الأخطاء الإملائية): الأخطاء تُحسب بين جذوع الكلمات (light_stem) لا الكلمات كاملة،
+# فلا تُعد "ال" والضمائر المتصلة أخطاءً ولا تُحسب "عند" قريبة من "عقد". فهرس ثلاثيات حروف على جذوع المفردات:
+# الجذع محاط بحرفي حشو من كل جانب، فلجذع طوله n عدد n + 2 ثلاثية، وكل تعديل (إبدال حرف أو حذفه أو إضافته)
+# يغيّر ثلاث ثلاثيات على الأكثر: الجذع الذي على مسافة تحرير k أو أقل يشترك مع جذع الكلمة في n + 2 - 3k ثلاثية على الأقل.
+# الجذوع التي تبلغ هذا العدد فقط يُتحقق منها بمسافة تحرير محدودة، ثم تُقرأ مفرداتها بصيغها (stem_variants) كالبحث الصرفي.
+# إلى ذلك تُضاف دائمًا مفردات المطابقة العادية (الجزئية أو التامة) بلا أخطاء، فلا ينقص البحث التقريبي عن العادي.
+# ----------------------------------------------------
+
+FUZZY_MODE = "fuzzy"
+FUZZY_WEIGHTS = (1.0, 0.3, 0.1)  # وزن المفردة في الترتيب حسب عدد الأخطاء: المطابقة الصحيحة أولًا
+# الجذع بهذا الطول أو أقصر يقبل إبدال حرف أو إضافة حرف سقط منه ("مسول" ← "مسوول")، لا حذف حرف منه:
+# الجذع الأقصر بحرف كلمة أخرى غالبًا ("محكم" و "حكم"، "عقود" و "عقد")
+FUZZY_SHORT_STEM = 4
+_FUZZY_PAD = "  "
+
+
+def fuzzy_max_distance(stem):
+    """
+    أقصى عدد من الأخطاء حسب طول الجذع: لا شيء حتى ثلاثة أحرف، وخطأ واحد حتى سبعة
+    (دون حذف حرف حتى FUZZY_SHORT_STEM)، وخطآن لما بعدها
+    """
+    n = len(stem)
+    return 0 if n <= 3 else 1 if n <= 7 else 2
+
+
+def fuzzy_mode(base):
+    """طريقة المطابقة التقريبية فوق طريقة عادية (contains أو exact أو prefix أو suffix) تُضاف نتائجها بلا أخطاء"""
+    return (FUZZY_MODE, base)
+
+
+def _fuzzy_base(mode):
+    # الطريقة العادية داخل طريقة تقريبية، أو None لغير التقريبية
+    return mode[1] if isinstance(mode, tuple) and mode[0] == FUZZY_MODE else None
+
+
+def fuzzy_grams(token):
+    padded = _FUZZY_PAD + token + _FUZZY_PAD
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _EditDistance:
+    """
+    مسافة التحرير (Levenshtein) من كلمة ثابتة إلى كلمات كثيرة بخوارزمية Myers المتوازية على البتات:
+    جدول مواضع حروف الكلمة يُحسب مرة، ثم كل حرف من الكلمة الأخرى عمليات قليلة على عدد صحيح.
+    """
+
+    def __init__(self, word):
+        self.word = word
+        self.peq = {}
+        for i, c in enumerate(word):
+            self.peq[c] = self.peq.get(c, 0) | (1 << i)
+        self.mask = (1 << len(word)) - 1
+        self.high = 1 << (len(word) - 1) if word else 0
+
+    def within(self, other, k):
+        """هل مسافة التحرير إلى other تساوي k أو أقل؟"""
+        return abs(len(self.word) - len(other)) <= k and self.distance(other) <= k
+
+    def distance(self, other):
+        n = len(self.word)
+        if not n or not other:
+            return max(n, len(other))
+        peq, mask, high = self.peq, self.mask, self.high
+        pv, mv, score = mask, 0, n
+        for c in other:
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = (mv | ~(xh | pv)) & mask
+            mh = pv & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = (mh | ~(xv | ph)) & mask
+            mv = ph & xv
+        return score
+
+
+def fuzzy_weight(distance):
+    """وزن المفردة في الترتيب حسب عدد أخطائها، تُضرب به درجة المادة بأعلى وزن بين مفرداتها"""
+    return FUZZY_WEIGHTS[min(distance, len(FUZZY_WEIGHTS) - 1)]
+
+
+def fuzzy_matches(word, gram_postings, token_at, k=None):
+    """
+    [(رقم, عدد الأخطاء)] للمفردات التي على مسافة تحرير k (افتراضيًا fuzzy_max_distance(word)) أو أقل من الكلمة،
+    بترتيب عدد الأخطاء ثم الرقم. gram_postings(ثلاثية) ← أرقام المفردات التي تحتويها (أو None)، و token_at(رقم) ← المفردة.
+    """
+    k = fuzzy_max_distance(word) if k is None else k
+    grams = fuzzy_grams(word)
+    need = max(len(grams) - 3 * k, 1)
+    postings = sorted((gram_postings(gram) or () for gram in grams), key=len)
+    # المفردة التي تشترك في need ثلاثية لا بد أن تظهر في إحدى أندر len - need + 1 قائمة،
+    # فالقوائم الأكبر (مثل ثلاثيات "ال" في أول الكلمة) تُستخدم للعد فقط ولا تضيف مرشحين
+    rare = len(postings) - need + 1
+    counts = Counter()
+    for p in postings[:rare]:
+        counts.update(p)
+    for p in postings[rare:]:
+        for i in counts.keys() & set(p):
+            counts[i] += 1
+    distance = _EditDistance(word)
+    found = []
+    for i, shared in counts.items():
+        if shared >= need:
+            other = token_at(i)
+            if abs(len(word) - len(other)) <= k:
+                d = distance.distance(other)
+                if d <= k:
+                    found.append((d, i))
+    found.sort()
+    return [(i, d) for d, i in found]
+
+
+def fuzzy_stems(word, gram_postings, stem_at):
+    """
+    {جذع: عدد الأخطاء}: جذع الكلمة المطبّعة نفسه، والجذوع القريبة منه (fuzzy_max_distance على طول الجذع).
+    gram_postings(ثلاثية) ← أرقام الجذوع التي تحتويها (أو None)، و stem_at(رقم) ← الجذع.
+    """
+    stem = light_stem(word)
+    found = {stem: 0}
+    for i, d in fuzzy_matches(stem, gram_postings, stem_at):
+        other = stem_at(i)
+        if d and len(stem) <= FUZZY_SHORT_STEM and len(other) < len(stem):
+            continue
+        found.setdefault(other, d)
+    return found
+
+
+def fuzzy_variants(stems):
+    """
+    {مفتاح في فهرس الجذوع: عدد الأخطاء} لجذوع fuzzy_stems بصيغها (stem_variants) كما في البحث الصرفي،
+    بترتيب عدد الأخطاء. الجذع القريب بأخطاء لا يُنزع منه حرف أوله: "بحكم" قريبة من "محكم" أما "حكم" فلا.
+    """
+    variants = {}
+    for stem, d in sorted(stems.items(), key=lambda item: item[1]):
+        for variant in stem_variants(stem):
+            if not d or len(variant) >= len(stem):
+                variants.setdefault(variant, d)
+    return variants
+
+
+def fuzzy_accepts(word, exact_match=False):
+    """
+    دالة تقبل الكلمة المطبّعة إن طابقتها كلمة الاستعلام word كما في البحث التقريبي: مطابقة عادية
+    (احتواء، أو تساوٍ مع exact_match)، أو جذع قريب منها بعد نزع حرف متصل أو تاء مفتوحة (عكس stem_variants).
+    """
+    stem = light_stem(word)
+    distance, k = _EditDistance(stem), fuzzy_max_distance(stem)
+
+    def accept(token):
+        if token == word or (not exact_match and word in token):
+            return True
+        other = light_stem(token)
+        if other == stem:
+            return True
+        candidates = [other]
+        if other[:1] in _STEM_CLITICS and len(other) > _STEM_MIN_LENGTH:
+            candidates.append(other[1:])
+        if other.endswith("ت"):
+            candidates.append(other[:-1])
+        if stem in candidates:
+            return True
+        if len(stem) <= FUZZY_SHORT_STEM:
+            candidates = [c for c in candidates if len(c) >= len(stem)]
+        return any(distance.within(c, k) for c in candidates)
+    return accept
+
+
+def list_law_files(laws_dir=LAWS_DIR):
+    return [f for f in os.listdir(laws_dir) if f.endswith(".docx")]
+
+
+def law_name(file):
+    return file.replace(".docx", "")
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY, _W_P, _W_R, _W_HYPERLINK = _W + "body", _W + "p", _W + "r", _W + "hyperlink"
+_W_T, _W_BR, _W_TYPE = _W + "t", _W + "br", _W + "type"
+# العناصر داخل w:r ونصها المقابل كما في python-docx (Run.text)
+_RUN_CHARS = {_W + "tab": "\t", _W + "ptab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+_OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+_PKG_RELS = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+
+def _main_document_part(zf):
+    """مسار الجزء الرئيسي للمستند داخل الحزمة (عادةً word/document.xml)"""
+    try:
+        rels = etree.fromstring(zf.read("_rels/.rels"))
+    except KeyError:
+        return "word/document.xml"
+    for rel in rels.iter(_PKG_RELS):
+        if rel.get("Type") == _OFFICE_DOCUMENT_REL:
+            return rel.get("Target").lstrip("/")
+    return "word/document.xml"
+
+
+def _run_text(run, parts):
+    for e in run:
+        if e.tag == _W_T:
+            parts.append(e.text or "")
+        elif e.tag == _W_BR:
+            # فاصل السطر فقط يصبح "\n"، أما فاصل الصفحة أو العمود فلا نص له
+            if e.get(_W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif e.tag in _RUN_CHARS:
+            parts.append(_RUN_CHARS[e.tag])
+
+
+def _paragraph_text(p):
+    parts = []
+    for child in p:
+        if child.tag == _W_R:
+            _run_text(child, parts)
+        elif child.tag == _W_HYPERLINK:
+            for run in child:
+                if run.tag == _W_R:
+                    _run_text(run, parts)
+    return "".join(parts)
+
+
+def iter_docx_paragraphs(path):
+    """
+    قراءة نصوص فقرات المستند (فقرات w:body المباشرة كما في Document.paragraphs)
+    بتحليل تدريجي لـ word/document.xml من داخل الملف المضغوط، دون بناء شجرة المستند كاملة.
+    كل فقرة وما سبقها تُحذف من الذاكرة بعد إرجاع نصها.
+    """
+    with zipfile.ZipFile(path) as zf:
+        with zf.open(_main_document_part(zf)) as xml_file:
+            for _, p in etree.iterparse(xml_file, events=("end",), tag=_W_P):
+                parent = p.getparent()
+                if parent is None or parent.tag != _W_BODY:
+                    continue  # فقرات الجداول ومربعات النص ليست ضمن Document.paragraphs
+                yield _paragraph_text(p)
+                p.clear()
+                while p.getprevious() is not None:
+                    del parent[0]
+
+
+def read_docx_paragraphs(path):
+    """قراءة فقرات الملف غير الفارغة بعد إزالة المسافات الطرفية"""
+    for text in iter_docx_paragraphs(path):
+        txt = text.strip()
+        if txt:
+            yield txt
+
+
+def segment_articles(paragraphs):
+    """
+    تقسيم الفقرات إلى مواد: كل فقرة تبدأ بـ "مادة (رقم)" تفتح مادة جديدة،
+    وما قبل أول مادة يُنسب إلى مادة "غير معروفة".
+    """
+    last_article = UNKNOWN_ARTICLE
+    current_article_paragraphs = []
+    for txt in paragraphs:
+        match = ARTICLE_RE.match(txt)
+        if match:
+            if current_article_paragraphs:
+                yield last_article, current_article_paragraphs
+                current_article_paragraphs = []
+            last_article = match.group(1)
+        current_article_paragraphs.append(txt)
+    if current_article_paragraphs:
+        yield last_article, current_article_paragraphs
+
+
+# الإحالة إلى مواد أخرى في نص المادة: "وفقًا للمادة (45)"، "المادتين (3) و(4)"، "المواد (10، 11)"، "المواد من (5) إلى (9)".
+# الإحالة متبوعة بنقطتين عنوان مادة داخل النص لا إحالة، والمتبوعة بـ "من قانون ..." إلى قانون آخر.
+# الأرقام العربية والإنجليزية تُقبل كما هي، ثم تُطبّع الأرقام الملتقطة فقط بـ normalize_arabic_numbers.
+_CITATION_SEPARATOR = r'\s*(?:[,،\-]|و|إلى|الى|حتى)\s*'
+# "رقم" اختيارية قبل الرقم كما في "المادة رقم (5)" و "المواد أرقام 5 و 6" و "من رقم 5 إلى رقم 9"
+_CITATION_NUMBER = (r'(?:(?:رقم|رقمي|[أا]رقام)\s*)?'
+                    r'(?:[\(\[]\s*[0-9٠-٩]+(?:' + _CITATION_SEPARATOR + r'[0-9٠-٩]+)*\s*[\)\]]|[0-9٠-٩]+)')
+CITATION_RE = re.compile(
+    r'(?<!\w)[وفبل]?(?:ال|لل)?(?:مادت[اي]ن|ماد[ةه]|مواد|ماد)\s*(?:من\s*)?'
+    r'(' + _CITATION_NUMBER + r'(?:' + _CITATION_SEPARATOR + _CITATION_NUMBER + r')*)'
+    r'(?!\s*:)'
+)
+_CITATION_RANGE_RE = re.compile(r'([0-9]+)\s*[\)\]]?\s*(?:\-|إلى|الى|حتى)\s*(?:رقم\s*)?[\(\[]?\s*([0-9]+)')
+_EXTERNAL_LAW_RE = re.compile(r'\s*[\.،,]?\s*(?:من|في|ب)\s*(?:ال)?(?:قانون|لائح[ةه]|دستور|قرار)')
+MAX_CITATION_RANGE = 50  # أطول مدى يُفك إلى مواده ("المواد من 10 إلى 15")
+
+
+def article_citations(text):
+    """أرقام المواد (بأرقام إنجليزية ودون تكرار) التي يحيل إليها نص مادة داخل القانون نفسه"""
+    numbers = []
+    for m in CITATION_RE.finditer(text):
+        if _EXTERNAL_LAW_RE.match(text, m.end()):
+            continue
+        group = normalize_arabic_numbers(m.group(1))
+        refs = {int(n) for n in re.findall(r'[0-9]+', group)}
+        for start, end in _CITATION_RANGE_RE.findall(group):
+            if 0 < int(end) - int(start) <= MAX_CITATION_RANGE:
+                refs.update(range(int(start) + 1, int(end)))
+        for ref in sorted(refs):
+            if str(ref) not in numbers:
+                numbers.append(str(ref))
+    return numbers
+
+
+def parse_law_file(path):
+    """إرجاع مواد الملف بصيغة [رقم المادة, الفقرات, النص المطبّع]"""
+    segments = list(segment_articles(read_docx_paragraphs(path)))
+    norms = normalize_arabic_texts("\n".join(paragraphs) for _, paragraphs in segments)
+    return [[num, paragraphs, norm] for (num, paragraphs), norm in zip(segments, norms)]
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _entry_is_fresh(entry, path, stat):
+    """
+    تُرجع المدخل إن كان ما زال مطابقًا للملف، وإلا None.
+    إن تغيّر وقت التعديل فقط (نسخ أو لمس الملف) نتحقق من المحتوى قبل إعادة التحليل.
+    """
+    if entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+        return entry
+    if entry.get("size") == stat.st_size and entry.get("sha1") == file_hash(path):
+        return dict(entry, mtime=stat.st_mtime)
+    return None
+
+
+def _read_corpus_file(corpus_file):
+    if not os.path.exists(corpus_file):
+        return None
+    try:
+        with open(corpus_file, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if corpus.get("version") != CORPUS_VERSION:
+        return None
+    return corpus
+
+
+@contextlib.contextmanager
+def _replace_file(path, mode="w", **kwargs):
+    """
+    الكتابة في ملف مؤقت باسم فريد بجانب path ثم os.replace عند النجاح،
+    فلا تقرأ عملية أخرى ملفًا ناقصًا ولا تكتب عمليتان في الملف المؤقت نفسه.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+    try:
+        with open(fd, mode, **kwargs) as f:
+            yield f
+        # mkstemp ينشئ الملف للمالك فقط، والملف النهائي يقرؤه كل من يشغّل التطبيق
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+@contextlib.contextmanager
+def build_lock(path):
+    """
+    قفل بين العمليات على path + ".lock" حول إعادة البناء: التطبيق وواجهة HTTP وسطر الأوامر
+    تشترك افتراضيًا في الملف المجمّع والفهرس الثنائي، ولكل منها مراقب للمجلد،
+    فتبني عملية واحدة في كل مرة وتجد الباقية ما كتبته بعد أخذ القفل.
+    """
+    with open(path + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK يستسلم بعد عشر ثوانٍ: البناء في عملية أخرى قد يطول أكثر
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_corpus_file(corpus, corpus_file):
+    with _replace_file(corpus_file, "w", encoding="utf-8") as f:
+        json.dump(corpus, f, ensure_ascii=False, separators=(",", ":"), default=_corpus_json_default)
+
+
+def _parse_law_job(path):
+    # تُنفَّذ داخل عملية منفصلة، لذا تُرجع كل ما يلزم لمدخل الملف
+    return file_hash(path), parse_law_file(path)
+
+
+def parse_law_files(paths, workers=None):
+    """
+    تحليل عدة ملفات بالتوازي على ProcessPoolExecutor (عملية لكل نواة افتراضيًا).
+    تُرجع {المسار: (sha1, المواد)} أو الاستثناء الذي وقع عند تحليل ذلك الملف.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    results = {}
+    if workers <= 1:
+        for path in paths:
+            try:
+                results[path] = _parse_law_job(path)
+            except Exception as e:
+                results[path] = e
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {path: pool.submit(_parse_law_job, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = e
+    return results
+
+
+def update_corpus(corpus, laws_dir=LAWS_DIR, workers=None):
+    """
+    مقارنة الملف المجمّع (أو None) بمجلد القوانين دون تعديله:
+    يُعاد تحليل الملفات الجديدة أو المعدّلة فقط (بالتوازي)، وتُحذف الملفات التي لم تعد موجودة.
+    تُرجع (corpus, errors, changed) حيث errors قاموس {اسم الملف: رسالة الخطأ}.
+    """
+    old_laws = corpus["laws"] if corpus else {}
+    changed = corpus is None
+    files = list_law_files(laws_dir)
+    fresh_entries = {}
+    pending = {}
+    for file in files:
+        path = os.path.join(laws_dir, file)
+        stat = os.stat(path)
+        entry = old_laws.get(file)
+        if entry is not None:
+            fresh = _entry_is_fresh(entry, path, stat)
+            if fresh is not None:
+                changed = changed or fresh is not entry
+                fresh_entries[file] = fresh
+                continue
+        pending[file] = (path, stat)
+
+    parsed = parse_law_files([path for path, _ in pending.values()], workers) if pending else {}
+
+    # الدمج بترتيب الملفات في المجلد بغض النظر عن ترتيب انتهاء العمليات
+    laws = {}
+    errors = {}
+    for file in files:
+        if file in fresh_entries:
+            laws[file] = fresh_entries[file]
+        else:
+            path, stat = pending[file]
+            result = parsed[path]
+            if isinstance(result, Exception):
+                errors[file] = str(result)
+                continue
+            sha1, articles = result
+            laws[file] = {
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "sha1": sha1,
+                "articles": articles,
+            }
+            changed = True
+    if list(laws) != list(old_laws):
+        changed = True
+    return {"version": CORPUS_VERSION, "laws": laws}, errors, changed
+
+
+def load_corpus(laws_dir=LAWS_DIR, corpus_file=CORPUS_FILE, workers=None):
+    """
+    تحميل الملف المجمّع وتحديثه بما تغيّر من القوانين ثم حفظه إن تغيّر.
+    تُرجع (corpus, errors).
+    """
+    corpus, errors, changed = update_corpus(_read_corpus_file(corpus_file), laws_dir, workers)
+    if changed:
+        _write_corpus_file(corpus, corpus_file)
+    return corpus, errors
+
+
+def laws_dir_signature(laws_dir=LAWS_DIR):
+    """بصمة سريعة لمجلد القوانين من أسماء الملفات وأحجامها وأوقات تعديلها"""
+    signature = []
+    for file in sorted(list_law_files(laws_dir)):
+        stat = os.stat(os.path.join(laws_dir, file))
+        signature.append((file, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def corpus_signature(corpus):
+    return tuple((file, entry["sha1"]) for file, entry in corpus["laws"].items())
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _citation_graph(segments, offsets):
+    """
+    الإحالات بين المواد بأرقامها التسلسلية في الاتجاهين، كل اتجاه مصفوفتان (offsets, ids):
+    مواد المادة aid هي ids[offsets[aid]:offsets[aid + 1]]، فتتبع الإحالة بحث مباشر لا مسح للمواد.
+    """
+    cite_offsets, cite_ids = array("I", [0]), array("I")
+    reverse = {}
+    for seg, off in zip(segments, offsets):
+        for local_id, targets in enumerate(seg.citations):
+            for target in targets:
+                cite_ids.append(off + target)
+                reverse.setdefault(off + target, []).append(off + local_id)
+            cite_offsets.append(len(cite_ids))
+    cited_offsets, cited_ids = array("I", [0]), array("I")
+    for aid in range(len(cite_offsets) - 1):
+        cited_ids.extend(reverse.get(aid, ()))
+        cited_offsets.append(len(cited_ids))
+    return cite_offsets, cite_ids, cited_offsets, cited_ids
+
+
+def _intersect(postings):
+    """تقاطع قوائم المواد بدءًا بأقصرها"""
+    postings = sorted(postings, key=len)
+    if not postings:
+        return set()
+    result = set(postings[0])
+    for p in postings[1:]:
+        if not result:
+            break
+        result.intersection_update(p)
+    return result
+
+
+class ArticleStore:
+    """
+    نصوص مواد ملف واحد بصيغة عمودية مضغوطة بدل قائمة من الفقرات لكل مادة:
+    - plain: نصوص المواد (الفقرات مفصولة بسطر) متتالية في سلسلة واحدة، و plain_offsets حدودها
+    - norm: النصوص المطبّعة يتبع كلًّا منها سطر (حتى لا تلتصق كلمة بكلمة المادة التالية)، و norm_offsets بداياتها
+    - para_offsets: بداية كل فقرة داخل plain، و article_paras رقم أول فقرة لكل مادة
+    - num_ids: رقم كل مادة كفهرس في num_names
+    """
+
+    def __init__(self, articles):
+        plain, norms = [], []
+        self.plain_offsets = array("I", [0])
+        self.norm_offsets = array("I", [0])
+        self.para_offsets = array("I")
+        self.article_paras = array("I", [0])
+        self.num_ids = array("I")
+        self.num_names = []
+        name_ids = {}
+        pos = norm_pos = 0
+        for num, paragraphs, norm in articles:
+            for p in paragraphs:
+                self.para_offsets.append(pos)
+                pos += len(p) + 1
+            text = "\n".join(paragraphs)
+            pos = self.plain_offsets[-1] + len(text)
+            plain.append(text)
+            self.plain_offsets.append(pos)
+            self.article_paras.append(len(self.para_offsets))
+            norms.append(norm)
+            norm_pos += len(norm) + 1
+            self.norm_offsets.append(norm_pos)
+            if num not in name_ids:
+                name_ids[num] = len(self.num_names)
+                self.num_names.append(num)
+            self.num_ids.append(name_ids[num])
+        self.plain = "".join(plain)
+        self.norm = "".join(norm + "\n" for norm in norms)
+
+    def __len__(self):
+        return len(self.num_ids)
+
+    def num(self, i):
+        return self.num_names[self.num_ids[i]]
+
+    def plain_text(self, i):
+        return self.plain[self.plain_offsets[i]:self.plain_offsets[i + 1]]
+
+    def norm_span(self, i):
+        """حدود النص المطبّع للمادة داخل norm، للبحث فيه مباشرة دون نسخه"""
+        return self.norm_offsets[i], self.norm_offsets[i + 1] - 1
+
+    def norm_text(self, i):
+        return self.norm[self.norm_offsets[i]:self.norm_offsets[i + 1] - 1]
+
+    def paragraphs(self, i):
+        first, last = self.article_paras[i], self.article_paras[i + 1]
+        end = self.plain_offsets[i + 1]
+        return [
+            self.plain[self.para_offsets[k]:self.para_offsets[k + 1] - 1 if k + 1 < last else end]
+            for k in range(first, last)
+        ]
+
+    def law_text(self):
+        """نص الملف كاملًا: الفقرات بترتيبها يفصل بينها سطر فارغ"""
+        return "".join(p + "\n\n" for i in range(len(self)) for p in self.paragraphs(i))
+
+    def articles(self):
+        """المواد بصيغة الملف المجمّع [رقم المادة, الفقرات, النص المطبّع]"""
+        return [[self.num(i), self.paragraphs(i), self.norm_text(i)] for i in range(len(self))]
+
+
+def _corpus_json_default(value):
+    # المدخلات التي صارت مخزنًا مضغوطًا في الذاكرة تُكتب بنفس صيغة الملف المجمّع
+    if isinstance(value, ArticleStore):
+        return value.articles()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class LawSegment:
+    """
+    فهرس مقلوب لملف قانون واحد بأرقام مواد محلية (0 .. عدد مواد الملف - 1):
+    - token_postings: الكلمة الكاملة ← أرقام المواد (للمطابقة التامة)
+    - token_freqs: بموازاة token_postings، عدد مرات ورود الكلمة في كل مادة (للترتيب BM25)
+    - token_positions: مواقع الكلمة (ترتيبها بين كلمات المادة) لكل مادة متتالية بترتيب token_postings،
+      ولكل مادة منها token_freqs موقعًا (للعبارات والقرب في الاستعلام المنطقي)
+    - trigram_postings: كل ثلاثة أحرف متتالية ← أرقام المواد (للمطابقة الجزئية)
+    - article_lookup: رقم المادة بأرقام إنجليزية ← أرقام المواد
+    - citations: لكل مادة أرقام المواد التي تحيل إليها في الملف نفسه (article_citations)
+    - vocabulary: مفردات الملف في نص واحد يسبق كل كلمة سطر ويتبعها سطر، و vocabulary_starts بداياتها
+      (للبحث عن الكلمات التي تحتوي نصًا أو تبدأ به أو تنتهي به بـ str.find بدل المرور على كل كلمة)
+    - stem_tokens / root_tokens: الجذع (light_stem) أو الجذر التقريبي ← مفردات الملف التي تشترك فيه
+      (فهرس صرفي صغير فوق المفردات يُبنى عند أول بحث صرفي: المواد تُقرأ من token_postings للكلمات المقابلة)
+    - stem_grams: ثلاثيات حروف الجذوع (fuzzy_grams) ← أرقامها في stem_keys (مفاتيح stem_tokens)، للبحث التقريبي،
+      ويُبنى كذلك عند أول استخدام
+    - store: نصوص المواد في ArticleStore
+    """
+
+    def __init__(self, file, entry):
+        self.file = file
+        self.sha1 = entry["sha1"]
+        articles = entry["articles"]
+        self.store = articles if isinstance(articles, ArticleStore) else ArticleStore(articles)
+        self.token_postings = {}
+        self.token_freqs = {}
+        self.token_positions = {}
+        self.doc_lengths = []
+        self.trigram_postings = {}
+        self.article_lookup = {}
+        cited_numbers = []
+        for local_id in range(len(self.store)):
+            num, norm = self.store.num(local_id), self.store.norm_text(local_id)
+            norm_num = normalize_arabic_numbers(num)
+            self.article_lookup.setdefault(norm_num, []).append(local_id)
+            # عنوان المادة نفسه ("مادة (12)" دون نقطتين) ليس إحالة
+            cited_numbers.append([ref for ref in article_citations(self.store.plain_text(local_id)) if ref != norm_num])
+            tokens = norm.split(" ") if norm else []
+            self.doc_lengths.append(len(tokens))
+            positions = {}
+            for pos, token in enumerate(tokens):
+                positions.setdefault(token, []).append(pos)
+            for token, token_positions in positions.items():
+                self.token_postings.setdefault(token, []).append(local_id)
+                self.token_freqs.setdefault(token, []).append(len(token_positions))
+                self.token_positions.setdefault(token, array("I")).extend(token_positions)
+            for gram in _trigrams(norm):
+                self.trigram_postings.setdefault(gram, []).append(local_id)
+        self.vocabulary_tokens = list(self.token_postings)
+        self.vocabulary_starts = array("I")
+        pos = 1
+        for token in self.vocabulary_tokens:
+            self.vocabulary_starts.append(pos)
+            pos += len(token) + 1
+        self.vocabulary = "\n" + "".join(token + "\n" for token in self.vocabulary_tokens)
+        # الإحالة إلى رقم تحمله أكثر من مادة (نسخ معدلة مثلًا) تشملها كلها
+        self.citations = [[target for ref in refs for target in self.article_lookup.get(ref, ())] for refs in cited_numbers]
+        self.stem_tokens = self.root_tokens = None
+        self.stem_keys = self.stem_grams = None
+
+    def _morphology_tables(self):
+        # بناؤه مرتين من خيطين في نفس الوقت لا يضر: النتيجة واحدة والإسناد الأخير يبقى
+        if self.root_tokens is None:
+            stem_tokens, root_tokens = {}, {}
+            for token in self.vocabulary_tokens:
+                stem = light_stem(token)
+                stem_tokens.setdefault(stem, []).append(token)
+                root_tokens.setdefault(_stem_root(stem), []).append(token)
+            self.stem_tokens, self.root_tokens = stem_tokens, root_tokens
+        return self.stem_tokens, self.root_tokens
+
+    def _stem_grams(self):
+        if self.stem_grams is None:
+            stem_keys = list(self._morphology_tables()[0])
+            grams = {}
+            for i, stem in enumerate(stem_keys):
+                for gram in fuzzy_grams(stem):
+                    grams.setdefault(gram, array("I")).append(i)
+            self.stem_keys, self.stem_grams = stem_keys, grams
+        return self.stem_keys, self.stem_grams
+
+    def near_stems(self, word):
+        """جذوع الملف القريبة من جذع الكلمة (fuzzy_stems)"""
+        stem_keys, grams = self._stem_grams()
+        return fuzzy_stems(word, grams.get, stem_keys.__getitem__)
+
+    def fuzzy_tokens(self, word, base, variants):
+        """{مفردة: عدد الأخطاء} لكلمة في البحث التقريبي: مفردات الطريقة العادية base بلا أخطاء، ثم مفردات variants"""
+        found = dict.fromkeys(self.match_tokens(word, base), 0)
+        stem_tokens = self._morphology_tables()[0]
+        for variant, d in variants.items():
+            for token in stem_tokens.get(variant, ()):
+                found.setdefault(token, d)
+        return found
+
+    def exact_candidates(self, kw):
+        postings = []
+        for token in kw.split(" "):
+            p = self.token_postings.get(token)
+            if not p:
+                return set()
+            postings.append(p)
+        return _intersect(postings)
+
+    def substring_candidates(self, kw):
+        if len(kw) >= 3:
+            postings = []
+            for gram in _trigrams(kw):
+                p = self.trigram_postings.get(gram)
+                if not p:
+                    return set()
+                postings.append(p)
+            return _intersect(postings)
+        # كلمة قصيرة (حرف أو حرفان) لا تحتوي مسافة: نبحث في مفردات الفهرس بدلًا من المواد
+        result = set()
+        for token, p in self.token_postings.items():
+            if kw in token:
+                result.update(p)
+        return result
+
+    def match_tokens(self, word, mode):
+        """
+        مفردات الملف التي تساوي الكلمة (exact) أو تحتويها (contains) أو تبدأ بها (prefix) أو تنتهي بها (suffix)،
+        أو تشترك معها في الجذع (stem) أو الجذر التقريبي (root). البحث التقريبي على مستوى الفهرس كله (LawIndex.fuzzy_terms).
+        """
+        if mode == "exact":
+            return [word] if word in self.token_postings else []
+        if mode in MORPHOLOGY_MODES:
+            stem_tokens, root_tokens = self._morphology_tables()
+            table = root_tokens if mode == "root" else stem_tokens
+            return [token for key in morphology_keys(word, mode) for token in table.get(key, ())]
+        # البداية بالسطر الذي يسبق الكلمة، والنهاية بالسطر الذي يليها
+        needle = {"prefix": "\n" + word, "suffix": word + "\n"}.get(mode, word)
+        shift = 1 if mode == "prefix" else 0
+        starts, found = self.vocabulary_starts, []
+        pos = self.vocabulary.find(needle)
+        while pos != -1:
+            i = bisect.bisect_right(starts, pos + shift) - 1
+            found.append(self.vocabulary_tokens[i])
+            if i + 1 >= len(starts):
+                break
+            pos = self.vocabulary.find(needle, starts[i + 1] - shift)
+        return found
+
+
+class LawIndex:
+    """
+    فهرس مقلوب على النص المطبّع للمواد، مكوّن من LawSegment لكل ملف.
+    كل مادة لها رقم تسلسلي (article id) بترتيب الملفات ثم ترتيب المواد داخلها،
+    - law_ids: رقم الملف (في files) لكل رقم تسلسلي، و article(aid) للملف والرقم والنص
+    - law_ranges: الملف ← (أول رقم تسلسلي, آخر رقم + 1)
+    - article_laws: رقم المادة ← أرقام المواد التي تحمل هذا الرقم في كل القوانين
+    - cites(aid) / cited_by(aid): المواد التي تحيل إليها المادة والمواد التي تحيل إليها (_citation_graph)
+    - errors: الملفات التي تعذرت قراءتها ورسالة الخطأ لكل منها
+    لا يُعدَّل الفهرس بعد بنائه، لذا يمكن مشاركته بين الجلسات والخيوط.
+    عند تمرير previous تُعاد استخدام أجزاء الملفات التي لم يتغير محتواها (نفس sha1).
+    """
+
+    def __init__(self, corpus, errors=None, previous=None):
+        self.files = list(corpus["laws"])
+        self.signature = corpus_signature(corpus)
+        self.errors = dict(errors or {})
+        reusable = {}
+        if previous is not None:
+            reusable = {seg.file: seg for seg in previous.segments}
+        self.segments = []
+        for file, entry in corpus["laws"].items():
+            seg = reusable.get(file)
+            if seg is None or seg.sha1 != entry["sha1"]:
+                seg = LawSegment(file, entry)
+            self.segments.append(seg)
+        self.offsets = []
+        self.law_ids = array("H")
+        self.law_ranges = {}
+        self.article_laws = {}
+        total_tokens = 0
+        for law_id, seg in enumerate(self.segments):
+            start = len(self.law_ids)
+            self.offsets.append(start)
+            self.law_ids.extend([law_id] * len(seg.store))
+            self.law_ranges[seg.file] = (start, len(self.law_ids))
+            for norm_num, local_ids in seg.article_lookup.items():
+                self.article_laws.setdefault(norm_num, []).extend(start + i for i in local_ids)
+            total_tokens += sum(seg.doc_lengths)
+        self.article_count = len(self.law_ids)
+        self.avg_doc_length = total_tokens / self.article_count if self.article_count else 0.0
+        self.cite_offsets, self.cite_ids, self.cited_offsets, self.cited_ids = _citation_graph(self.segments, self.offsets)
+
+    def _segments_for(self, files=None):
+        if files is None:
+            return list(zip(self.segments, self.offsets))
+        wanted = set(files)
+        return [(seg, off) for seg, off in zip(self.segments, self.offsets) if seg.file in wanted]
+
+    def law_text(self, file):
+        """نص القانون كاملًا: الفقرات بترتيبها يفصل بينها سطر فارغ"""
+        if file not in self.law_ranges:
+            return ""
+        return self.segments[self.files.index(file)].store.law_text()
+
+    def file_of(self, aid):
+        return self.files[self.law_ids[aid]]
+
+    def num_of(self, aid):
+        law_id = self.law_ids[aid]
+        return self.segments[law_id].store.num(aid - self.offsets[law_id])
+
+    def cites(self, aid):
+        """أرقام المواد التي تحيل إليها المادة"""
+        return self.cite_ids[self.cite_offsets[aid]:self.cite_offsets[aid + 1]].tolist()
+
+    def cited_by(self, aid):
+        """أرقام المواد التي تحيل إلى المادة"""
+        return self.cited_ids[self.cited_offsets[aid]:self.cited_offsets[aid + 1]].tolist()
+
+    def article(self, aid):
+        """(الملف, رقم المادة, النص) للرقم التسلسلي"""
+        law_id = self.law_ids[aid]
+        store = self.segments[law_id].store
+        local_id = aid - self.offsets[law_id]
+        return self.files[law_id], store.num(local_id), store.plain_text(local_id)
+
+    def article_ids(self, files=None):
+        if files is None:
+            return range(self.article_count)
+        ids = []
+        for file in files:
+            if file in self.law_ranges:
+                ids.extend(range(*self.law_ranges[file]))
+        return ids
+
+    def lookup_article(self, num, files=None):
+        """أرقام المواد التي تحمل الرقم المطلوب (يقبل الأرقام العربية والإنجليزية)"""
+        norm_num = normalize_arabic_numbers(num.strip())
+        if files is None:
+            return list(self.article_laws.get(norm_num, ()))
+        ids = []
+        for file in files:
+            if file in self.law_ranges:
+                seg_idx = self.files.index(file)
+                start = self.offsets[seg_idx]
+                ids.extend(start + i for i in self.segments[seg_idx].article_lookup.get(norm_num, ()))
+        return ids
+
+    def laws_with_article(self, num):
+        """الملفات التي تحتوي على مادة بهذا الرقم"""
+        files = []
+        for aid in self.article_laws.get(normalize_arabic_numbers(num.strip()), ()):
+            file = self.file_of(aid)
+            if file not in files:
+                files.append(file)
+        return files
+
+    def match_keywords(self, normalized_keywords, exact_match=False, files=None):
+        """أرقام المواد التي يطابق نصها المطبّع أيًّا من الكلمات المطبّعة"""
+        matched = set()
+        segments = self._segments_for(files)
+        for kw in normalized_keywords:
+            if not kw:
+                continue
+            if exact_match:
+                pattern = re.compile(r'(?<!\w)' + re.escape(kw) + r'(?!\w)')
+                for seg, off in segments:
+                    norm = seg.store.norm
+                    for local_id in seg.exact_candidates(kw):
+                        aid = off + local_id
+                        if aid not in matched and pattern.search(norm, *seg.store.norm_span(local_id)):
+                            matched.add(aid)
+            else:
+                for seg, off in segments:
+                    norm = seg.store.norm
+                    for local_id in seg.substring_candidates(kw):
+                        if norm.find(kw, *seg.store.norm_span(local_id)) != -1:
+                            matched.add(off + local_id)
+        return matched
+
+    def rank(self, article_ids, normalized_keywords, exact_match=False, top_k=50, k1=1.5, b=0.75, morphology=None,
+             fuzzy=False):
+        """
+        ترتيب المواد المعطاة حسب صلتها بالكلمات (BM25) وإرجاع أفضل top_k منها
+        بصيغة [(رقم المادة, الدرجة)] بترتيب تنازلي، مع تفضيل المادة الأسبق عند التساوي.
+        في المطابقة الجزئية تُوسَّع كل كلمة إلى المفردات التي تحتويها وتُعامل كأنها كلمة واحدة،
+        ومع morphology إلى المفردات التي تشترك معها في الجذع أو الجذر، ومع fuzzy إلى القريبة منها إملائيًا.
+        """
+        allowed = set(article_ids)
+        if not allowed:
+            return []
+        n_docs = self.article_count
+        scores = dict.fromkeys(allowed, 0.0)
+        mode = _word_mode(exact_match, morphology, fuzzy)
+        base = _fuzzy_base(mode)
+        for q in _split_query_terms(normalized_keywords):
+            tfs = {}
+            doc_lengths = {}
+            weights = {}
+            if base:
+                matches = self.fuzzy_terms(q, base)
+            else:
+                matches = [dict.fromkeys(seg.match_tokens(q, mode), 0) for seg in self.segments]
+            for seg, off, terms in zip(self.segments, self.offsets, matches):
+                for term, distance in terms.items():
+                    w = fuzzy_weight(distance)
+                    for local_id, tf in zip(seg.token_postings[term], seg.token_freqs[term]):
+                        aid = off + local_id
+                        tfs[aid] = tfs.get(aid, 0) + tf
+                        doc_lengths[aid] = seg.doc_lengths[local_id]
+                        if base:
+                            weights[aid] = max(weights.get(aid, 0), w)
+            if not tfs:
+                continue
+            idf = math.log(1 + (n_docs - len(tfs) + 0.5) / (len(tfs) + 0.5))
+            for aid, tf in tfs.items():
+                if aid in allowed:
+                    norm_len = 1 - b + b * doc_lengths[aid] / self.avg_doc_length
+                    scores[aid] += weights.get(aid, 1) * idf * tf * (k1 + 1) / (tf + k1 * norm_len)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def fuzzy_distances(self, article_ids, normalized_keywords, exact_match=False):
+        """{رقم المادة: أقل عدد أخطاء بين مفرداتها المطابقة} للمواد المعطاة في البحث التقريبي، لترتيبها دون BM25"""
+        wanted, found = set(article_ids), {}
+        base = _word_mode(exact_match)
+        for q in _split_query_terms(normalized_keywords):
+            for seg, off, terms in zip(self.segments, self.offsets, self.fuzzy_terms(q, base)):
+                for term, distance in terms.items():
+                    for local_id in seg.token_postings[term]:
+                        aid = off + local_id
+                        if aid in wanted and found.get(aid, distance + 1) > distance:
+                            found[aid] = distance
+        return found
+
+    def fuzzy_terms(self, word, base):
+        """
+        {مفردة: عدد الأخطاء} لكل ملف بترتيب segments، لكلمة في البحث التقريبي فوق الطريقة العادية base.
+        الجذوع القريبة تُجمع من كل الملفات أولًا ثم تُقرأ صيغها في كل ملف، فتطابق نتيجة الفهرس الثنائي.
+        """
+        stems = {}
+        for seg in self.segments:
+            for stem, d in seg.near_stems(word).items():
+                if stems.get(stem, d + 1) > d:
+                    stems[stem] = d
+        variants = fuzzy_variants(stems)
+        return [seg.fuzzy_tokens(word, base, variants) for seg in self.segments]
+
+    def token_matches(self, word, mode):
+        """مفردات الفهرس المقابلة لكلمة (انظر LawSegment.match_tokens) بصيغة [(مرجع, عدد المواد)]"""
+        base = _fuzzy_base(mode)
+        matches = self.fuzzy_terms(word, base) if base else [seg.match_tokens(word, mode) for seg in self.segments]
+        return [((law_id, token), len(seg.token_postings[token]))
+                for law_id, (seg, tokens) in enumerate(zip(self.segments, matches)) for token in tokens]
+
+    def token_positions(self, handles, within=None):
+        """{رقم المادة: [مواقع الكلمات]} لمراجع token_matches، للمواد الموجودة في within فقط إن حُددت"""
+        found = {}
+        for law_id, token in handles:
+            seg, off = self.segments[law_id], self.offsets[law_id]
+            positions = seg.token_positions[token]
+            start = 0
+            for local_id, tf in zip(seg.token_postings[token], seg.token_freqs[token]):
+                aid = off + local_id
+                if within is None or aid in within:
+                    found.setdefault(aid, []).extend(positions[start:start + tf])
+                start += tf
+        if len(handles) > 1:
+            for positions in found.values():
+                positions.sort()
+        return found
+
+
+# ----------------------------------------------------
+# الفهرس الثنائي: ملف واحد يُفتح بـ mmap ويُبحث فيه مباشرة دون تحويله إلى كائنات بايثون،
+# فلا يعتمد زمن الإقلاع ولا ذاكرة العملية على حجم القوانين، وتتشارك العمليات نفس الصفحات.
+#
+# الترأيس: INDEX_MAGIC، ثم الإصدار وعدد الأقسام، ثم (الاسم، الإزاحة، الطول) لكل قسم.
+# الأقسام مصفوفات أعداد (array) أو نصوص UTF-8، وكل قسم يبدأ عند إزاحة من مضاعفات 8:
+# - meta: JSON صغير (الملفات، التوقيعات، الأخطاء، أسماء أرقام المواد، متوسط طول المادة)
+# - plain / plain_offsets / para_offsets / article_paras: نصوص المواد وحدودها بالبايت
+# - norm / norm_offsets: النصوص المطبّعة يتبع كلًّا منها سطر
+# - law_ids / num_ids / doc_lengths: لكل رقم تسلسلي
+# - قواميس tokens و trigrams و numbers: مفاتيح مرتبة يتبع كلًّا منها سطر (keys, key_offsets)،
+#   ثم قوائم المواد (postings, post_offsets)، ومعها freqs للكلمات ومواقعها (positions, pos_offsets)
+# - قاموسا stems و roots: الجذع أو الجذر ← أرقام مفاتيح tokens التي تشترك فيه (بدل أرقام المواد)
+# - قاموس vocabulary grams: ثلاثيات حروف الجذوع (fuzzy_grams) ← أرقام مفاتيح قاموس stems، للبحث التقريبي
+# - cite_offsets / cite_ids و cited_offsets / cited_ids: الإحالات بين المواد في الاتجاهين (_citation_graph)
+# ----------------------------------------------------
+
+INDEX_FILE = "laws_index.bin"
+INDEX_MAGIC = b"YLAWIDX1"
+INDEX_VERSION = 8
+_INDEX_HEADER = struct.Struct("<8sII")
+_INDEX_SECTION = struct.Struct("<16sQQ")
+
+
+def _word_mode(exact_match=False, morphology=None, fuzzy=False):
+    """طريقة مطابقة كل كلمة (انظر LawSegment.match_tokens): الصرفية أولًا، ثم التقريبية، ثم التامة أو الجزئية"""
+    base = "exact" if exact_match else "contains"
+    return morphology or (fuzzy_mode(base) if fuzzy else base)
+
+
+def _split_query_terms(normalized_keywords):
+    """كلمات الاستعلام بعد تقسيم العبارات، دون تكرار"""
+    terms = []
+    for kw in normalized_keywords:
+        for q in kw.split(" ") if kw else ():
+            if q not in terms:
+                terms.append(q)
+    return terms
+
+
+def _dictionary_sections(prefix, mapping, with_freqs=False):
+    """قاموس {مفتاح: ([أرقام المواد], [التكرارات], [المواقع])} بصيغة أقسام الملف الثنائي"""
+    keys = sorted((key.encode("utf-8"), key) for key in mapping)
+    key_offsets, post_offsets, pos_offsets = array("Q", [0]), array("Q", [0]), array("Q", [0])
+    postings, freqs, positions = array("I"), array("I"), array("I")
+    for key_bytes, key in keys:
+        key_offsets.append(key_offsets[-1] + len(key_bytes) + 1)
+        ids, tfs, token_positions = mapping[key]
+        postings.extend(ids)
+        if with_freqs:
+            freqs.extend(tfs)
+            positions.extend(token_positions)
+            pos_offsets.append(len(positions))
+        post_offsets.append(len(postings))
+    sections = {
+        prefix + "keys": b"".join(key_bytes + b"\n" for key_bytes, _ in keys),
+        prefix + "key_offsets": key_offsets,
+        prefix + "postings": postings,
+        prefix + "post_offsets": post_offsets,
+    }
+    if with_freqs:
+        sections[prefix + "freqs"] = freqs
+        sections[prefix + "positions"] = positions
+        sections[prefix + "pos_offsets"] = pos_offsets
+    return sections
+
+
+def write_mapped_index(index, index_file=INDEX_FILE, dir_signature=()):
+    """كتابة LawIndex في ملف ثنائي (ملف مؤقت فريد ثم os.replace حتى لا تقرأ العمليات الأخرى ملفًا ناقصًا)"""
+    plain, norm = [], []
+    plain_offsets, norm_offsets = array("Q", [0]), array("Q", [0])
+    para_offsets, article_paras = array("Q"), array("I", [0])
+    num_ids, doc_lengths = array("I"), array("I")
+    num_names, name_ids = [], {}
+    tokens, trigrams, numbers = {}, {}, {}
+    for seg, off in zip(index.segments, index.offsets):
+        store = seg.store
+        for local_id in range(len(store)):
+            start = plain_offsets[-1]
+            paragraphs = [p.encode("utf-8") for p in store.paragraphs(local_id)]
+            for p in paragraphs:
+                para_offsets.append(start)
+                start += len(p) + 1
+            text = b"\n".join(paragraphs)
+            plain.append(text)
+            plain_offsets.append(plain_offsets[-1] + len(text))
+            article_paras.append(len(para_offsets))
+            text = store.norm_text(local_id).encode("utf-8") + b"\n"
+            norm.append(text)
+            norm_offsets.append(norm_offsets[-1] + len(text))
+            num = store.num(local_id)
+            if num not in name_ids:
+                name_ids[num] = len(num_names)
+                num_names.append(num)
+            num_ids.append(name_ids[num])
+        doc_lengths.extend(seg.doc_lengths)
+        for token, ids in seg.token_postings.items():
+            entry = tokens.setdefault(token, ([], [], array("I")))
+            entry[0].extend(off + i for i in ids)
+            entry[1].extend(seg.token_freqs[token])
+            entry[2].extend(seg.token_positions[token])
+        for gram, ids in seg.trigram_postings.items():
+            trigrams.setdefault(gram, ([], None, None))[0].extend(off + i for i in ids)
+        for norm_num, ids in seg.article_lookup.items():
+            numbers.setdefault(norm_num, ([], None, None))[0].extend(off + i for i in ids)
+
+    meta = {
+        "files": index.files,
+        "signature": [list(item) for item in index.signature],
+        "dir_signature": [list(item) for item in dir_signature],
+        "errors": index.errors,
+        "num_names": num_names,
+        "avg_doc_length": index.avg_doc_length,
+    }
+    sections = {
+        "meta": json.dumps(meta, ensure_ascii=False).encode("utf-8"),
+        "plain": b"".join(plain),
+        "plain_offsets": plain_offsets,
+        "para_offsets": para_offsets,
+        "article_paras": article_paras,
+        "norm": b"".join(norm),
+        "norm_offsets": norm_offsets,
+        "law_ids": index.law_ids,
+        "num_ids": num_ids,
+        "doc_lengths": doc_lengths,
+        "cite_offsets": index.cite_offsets,
+        "cite_ids": index.cite_ids,
+        "cited_offsets": index.cited_offsets,
+        "cited_ids": index.cited_ids,
+    }
+    sections.update(_dictionary_sections("tok_", tokens, with_freqs=True))
+    # أرقام المفاتيح بترتيبها في قسم tok_ (نفس ترتيب _dictionary_sections)
+    stems, roots, vocabulary_grams = {}, {}, {}
+    for i, (_, token) in enumerate(sorted((token.encode("utf-8"), token) for token in tokens)):
+        stem = light_stem(token)
+        stems.setdefault(stem, ([], None, None))[0].append(i)
+        roots.setdefault(_stem_root(stem), ([], None, None))[0].append(i)
+    # وبالمثل أرقام الجذوع بترتيبها في قسم stm_
+    for i, (_, stem) in enumerate(sorted((stem.encode("utf-8"), stem) for stem in stems)):
+        for gram in fuzzy_grams(stem):
+            vocabulary_grams.setdefault(gram, ([], None, None))[0].append(i)
+    sections.update(_dictionary_sections("stm_", stems))
+    sections.update(_dictionary_sections("rot_", roots))
+    sections.update(_dictionary_sections("vgr_", vocabulary_grams))
+    sections.update(_dictionary_sections("tri_", trigrams))
+    sections.update(_dictionary_sections("num_", numbers))
+
+    with _replace_file(index_file, "wb") as f:
+        pos = _INDEX_HEADER.size + _INDEX_SECTION.size * len(sections)
+        table, blobs = [], []
+        for name, data in sections.items():
+            blob = data.tobytes() if isinstance(data, array) else data
+            pos += -pos % 8
+            table.append(_INDEX_SECTION.pack(name.encode("ascii"), pos, len(blob)))
+            blobs.append((pos, blob))
+            pos += len(blob)
+        f.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(sections)))
+        f.write(b"".join(table))
+        for pos, blob in blobs:
+            f.write(b"\0" * (pos - f.tell()))
+            f.write(blob)
+
+
+class _MappedDictionary:
+    """قاموس مرتب داخل الملف الثنائي: بحث ثنائي على المفاتيح، وبحث نصي في كتلة المفاتيح للمطابقة الجزئية"""
+
+    def __init__(self, mapped, prefix, with_freqs=False):
+        self.keys = mapped.section(prefix + "keys")
+        self.key_offsets = mapped.section(prefix + "key_offsets", "Q")
+        self.postings = mapped.section(prefix + "postings", "I")
+        self.post_offsets = mapped.section(prefix + "post_offsets", "Q")
+        self.freqs = mapped.section(prefix + "freqs", "I") if with_freqs else None
+        self.positions = mapped.section(prefix + "positions", "I") if with_freqs else None
+        self.pos_offsets = mapped.section(prefix + "pos_offsets", "Q") if with_freqs else None
+        self.size = len(self.key_offsets) - 1
+
+    def _key(self, i):
+        return self.keys[self.key_offsets[i]:self.key_offsets[i + 1] - 1]
+
+    def key(self, i):
+        return self._key(i).decode("utf-8")
+
+    def _lower_bound(self, key):
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key):
+        """رقم المفتاح أو -1"""
+        key = key.encode("utf-8")
+        lo = self._lower_bound(key)
+        return lo if lo < self.size and self._key(lo) == key else -1
+
+    def prefixed(self, text):
+        """أرقام المفاتيح التي تبدأ بالنص: مدى متصل في الترتيب (لا يظهر البايت 0xff في UTF-8)"""
+        prefix = text.encode("utf-8")
+        return range(self._lower_bound(prefix), self._lower_bound(prefix + b"\xff"))
+
+    def get(self, key):
+        i = self.find(key)
+        if i < 0:
+            return None
+        return self.postings[self.post_offsets[i]:self.post_offsets[i + 1]]
+
+    def containing(self, text):
+        """أرقام المفاتيح التي تحتوي النص، بالبحث في كتلة المفاتيح كلها مرة واحدة"""
+        needle = text.encode("utf-8")
+        found = []
+        pos = self.keys.find(needle)
+        while pos != -1:
+            i = bisect.bisect_right(self.key_offsets, pos) - 1
+            found.append(i)
+            pos = self.keys.find(needle, self.key_offsets[i + 1])
+        return found
+
+
+class MappedLawIndex:
+    """
+    نفس واجهة LawIndex في البحث (article و lookup_article و match_keywords و rank ...)
+    لكن على ملف ثنائي مفتوح بـ mmap للقراءة فقط: لا يُحمَّل من الملف إلا ما تلمسه عملية البحث.
+    """
+
+    def __init__(self, index_file=INDEX_FILE):
+        with open(index_file, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _INDEX_HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"ملف فهرس غير مدعوم: {index_file}")
+        self._view = memoryview(self._mm)
+        self._sections = {}
+        for i in range(count):
+            name, offset, length = _INDEX_SECTION.unpack_from(self._mm, _INDEX_HEADER.size + i * _INDEX_SECTION.size)
+            self._sections[name.rstrip(b"\0").decode("ascii")] = (offset, length)
+        meta = json.loads(bytes(self.section("meta")))
+        self.files = meta["files"]
+        self.signature = tuple(tuple(item) for item in meta["signature"])
+        self.dir_signature = tuple(tuple(item) for item in meta["dir_signature"])
+        self.errors = meta["errors"]
+        self.avg_doc_length = meta["avg_doc_length"]
+        self._num_names = meta["num_names"]
+        self._plain = self.section("plain")
+        self._plain_offsets = self.section("plain_offsets", "Q")
+        self._para_offsets = self.section("para_offsets", "Q")
+        self._article_paras = self.section("article_paras", "I")
+        self._norm = self.section("norm")
+        self._norm_offsets = self.section("norm_offsets", "Q")
+        self.law_ids = self.section("law_ids", "H")
+        self._num_ids = self.section("num_ids", "I")
+        self._doc_lengths = self.section("doc_lengths", "I")
+        self._cite_offsets = self.section("cite_offsets", "I")
+        self._cite_ids = self.section("cite_ids", "I")
+        self._cited_offsets = self.section("cited_offsets", "I")
+        self._cited_ids = self.section("cited_ids", "I")
+        self._tokens = _MappedDictionary(self, "tok_", with_freqs=True)
+        self._trigrams = _MappedDictionary(self, "tri_")
+        self._numbers = _MappedDictionary(self, "num_")
+        self._stems = _MappedDictionary(self, "stm_")
+        self._roots = _MappedDictionary(self, "rot_")
+        self._vocabulary_grams = _MappedDictionary(self, "vgr_")
+        self.article_count = len(self.law_ids)
+        self.offsets = []
+        self.law_ranges = {}
+        start = 0
+        for law_id, file in enumerate(self.files):
+            end = bisect.bisect_right(self.law_ids, law_id, start)
+            self.offsets.append(start)
+            self.law_ranges[file] = (start, end)
+            start = end
+
+    def section(self, name, typecode=None):
+        """القسم كما هو في الذاكرة المشتركة: mmap للنصوص، أو memoryview بنوع الأعداد"""
+        offset, length = self._sections[name]
+        if typecode is None:
+            return _MappedBytes(self._mm, offset, length)
+        return self._view[offset:offset + length].cast(typecode)
+
+    def file_of(self, aid):
+        return self.files[self.law_ids[aid]]
+
+    def cites(self, aid):
+        return self._cite_ids[self._cite_offsets[aid]:self._cite_offsets[aid + 1]].tolist()
+
+    def cited_by(self, aid):
+        return self._cited_ids[self._cited_offsets[aid]:self._cited_offsets[aid + 1]].tolist()
+
+    def article(self, aid):
+        """(الملف, رقم المادة, النص) للرقم التسلسلي"""
+        text = self._plain[self._plain_offsets[aid]:self._plain_offsets[aid + 1]].decode("utf-8")
+        return self.file_of(aid), self.num_of(aid), text
+
+    def num_of(self, aid):
+        return self._num_names[self._num_ids[aid]]
+
+    def law_text(self, file):
+        """نص القانون كاملًا: الفقرات بترتيبها يفصل بينها سطر فارغ"""
+        if file not in self.law_ranges:
+            return ""
+        start, end = self.law_ranges[file]
+        parts = []
+        for aid in range(start, end):
+            for k in range(self._article_paras[aid], self._article_paras[aid + 1]):
+                stop = self._para_offsets[k + 1] - 1 if k + 1 < self._article_paras[aid + 1] else self._plain_offsets[aid + 1]
+                parts.append(self._plain[self._para_offsets[k]:stop])
+        return b"\n\n".join(parts + [b""]).decode("utf-8")
+
+    def article_ids(self, files=None):
+        if files is None:
+            return range(self.article_count)
+        ids = []
+        for file in files:
+            if file in self.law_ranges:
+                ids.extend(range(*self.law_ranges[file]))
+        return ids
+
+    def _in_files(self, ids, files):
+        if files is None:
+            return list(ids)
+        wanted = {self.files.index(file) for file in files if file in self.law_ranges}
+        return [aid for aid in ids if self.law_ids[aid] in wanted]
+
+    def lookup_article(self, num, files=None):
+        """أرقام المواد التي تحمل الرقم المطلوب (يقبل الأرقام العربية والإنجليزية)"""
+        ids = self._numbers.get(normalize_arabic_numbers(num.strip()))
+        if ids is None:
+            return []
+        if files is None:
+            return list(ids)
+        return [aid for file in files for aid in self._in_files(ids, [file])]
+
+    def laws_with_article(self, num):
+        """الملفات التي تحتوي على مادة بهذا الرقم"""
+        files = []
+        for aid in self.lookup_article(num):
+            file = self.file_of(aid)
+            if file not in files:
+                files.append(file)
+        return files
+
+    def _exact_candidates(self, kw):
+        postings = []
+        for token in kw.split(" "):
+            p = self._tokens.get(token)
+            if p is None:
+                return set()
+            postings.append(p)
+        return _intersect(postings)
+
+    def _substring_candidates(self, kw):
+        if len(kw) >= 3:
+            postings = []
+            for gram in _trigrams(kw):
+                p = self._trigrams.get(gram)
+                if p is None:
+                    return set()
+                postings.append(p)
+            return _intersect(postings)
+        # كلمة قصيرة (حرف أو حرفان) لا تحتوي مسافة: نبحث في مفردات الفهرس بدلًا من المواد
+        result = set()
+        tokens = self._tokens
+        for i in tokens.containing(kw):
+            result.update(tokens.postings[tokens.post_offsets[i]:tokens.post_offsets[i + 1]])
+        return result
+
+    def _contains_words(self, kw, aid):
+        # النص المطبّع كلمات من حروف \w تفصلها مسافة واحدة، فحدود الكلمة هي المسافة أو طرفا المادة
+        needle = kw.encode("utf-8")
+        start, end = self._norm_offsets[aid], self._norm_offsets[aid + 1] - 1
+        pos = self._norm.find(needle, start, end)
+        while pos != -1:
+            after = pos + len(needle)
+            if (pos == start or self._norm[pos - 1] == 0x20) and (after == end or self._norm[after] == 0x20):
+                return True
+            pos = self._norm.find(needle, pos + 1, end)
+        return False
+
+    def match_keywords(self, normalized_keywords, exact_match=False, files=None):
+        """أرقام المواد التي يطابق نصها المطبّع أيًّا من الكلمات المطبّعة"""
+        matched = set()
+        for kw in normalized_keywords:
+            if not kw:
+                continue
+            if exact_match:
+                for aid in self._in_files(self._exact_candidates(kw), files):
+                    if aid not in matched and self._contains_words(kw, aid):
+                        matched.add(aid)
+            else:
+                needle = kw.encode("utf-8")
+                for aid in self._in_files(self._substring_candidates(kw), files):
+                    if self._norm.find(needle, self._norm_offsets[aid], self._norm_offsets[aid + 1] - 1) != -1:
+                        matched.add(aid)
+        return matched
+
+    def _match_keys(self, word, mode):
+        tokens = self._tokens
+        if mode == "exact":
+            i = tokens.find(word)
+            return [i] if i >= 0 else []
+        if _fuzzy_base(mode):
+            return list(self._fuzzy_keys(word, _fuzzy_base(mode)))
+        if mode in MORPHOLOGY_MODES:
+            table = self._roots if mode == "root" else self._stems
+            keys = []
+            for key in morphology_keys(word, mode):
+                keys.extend(table.get(key) or ())
+            return keys
+        if mode == "prefix":
+            return tokens.prefixed(word)
+        if mode == "suffix":
+            # كل مفتاح في الكتلة يتبعه سطر، فالكلمة متبوعة بسطر لا تُطابق إلا نهايات المفاتيح
+            return tokens.containing(word + "\n")
+        return tokens.containing(word)
+
+    def _fuzzy_keys(self, word, base):
+        # {رقم المفردة: عدد الأخطاء}، كما في LawIndex.fuzzy_terms
+        found = dict.fromkeys(self._match_keys(word, base), 0)
+        for variant, d in fuzzy_variants(fuzzy_stems(word, self._vocabulary_grams.get, self._stems.key)).items():
+            for i in self._stems.get(variant) or ():
+                found.setdefault(i, d)
+        return found
+
+    def fuzzy_distances(self, article_ids, normalized_keywords, exact_match=False):
+        """نفس LawIndex.fuzzy_distances على القوائم المخزنة في الملف"""
+        tokens = self._tokens
+        wanted, found = set(article_ids), {}
+        base = _word_mode(exact_match)
+        for q in _split_query_terms(normalized_keywords):
+            for i, distance in self._fuzzy_keys(q, base).items():
+                for aid in tokens.postings[tokens.post_offsets[i]:tokens.post_offsets[i + 1]]:
+                    if aid in wanted and found.get(aid, distance + 1) > distance:
+                        found[aid] = distance
+        return found
+
+    def token_matches(self, word, mode):
+        """مفردات الفهرس المقابلة لكلمة (انظر LawSegment.match_tokens) بصيغة [(مرجع, عدد المواد)]"""
+        post_offsets = self._tokens.post_offsets
+        return [(i, post_offsets[i + 1] - post_offsets[i]) for i in self._match_keys(word, mode)]
+
+    def token_positions(self, handles, within=None):
+        """{رقم المادة: [مواقع الكلمات]} لمراجع token_matches، للمواد الموجودة في within فقط إن حُددت"""
+        tokens = self._tokens
+        found = {}
+        for i in handles:
+            lo, hi = tokens.post_offsets[i], tokens.post_offsets[i + 1]
+            start = tokens.pos_offsets[i]
+            for aid, tf in zip(tokens.postings[lo:hi], tokens.freqs[lo:hi]):
+                if within is None or aid in within:
+                    found.setdefault(aid, []).extend(tokens.positions[start:start + tf])
+                start += tf
+        if len(handles) > 1:
+            for positions in found.values():
+                positions.sort()
+        return found
+
+    def rank(self, article_ids, normalized_keywords, exact_match=False, top_k=50, k1=1.5, b=0.75, morphology=None,
+             fuzzy=False):
+        """نفس ترتيب LawIndex.rank (BM25) على القوائم المخزنة في الملف"""
+        allowed = set(article_ids)
+        if not allowed:
+            return []
+        tokens = self._tokens
+        scores = dict.fromkeys(allowed, 0.0)
+        mode = _word_mode(exact_match, morphology, fuzzy)
+        base = _fuzzy_base(mode)
+        for q in _split_query_terms(normalized_keywords):
+            tfs = {}
+            weights = {}
+            keys = self._fuzzy_keys(q, base) if base else dict.fromkeys(self._match_keys(q, mode), 0)
+            for i, distance in keys.items():
+                lo, hi = tokens.post_offsets[i], tokens.post_offsets[i + 1]
+                w = fuzzy_weight(distance)
+                for aid, tf in zip(tokens.postings[lo:hi], tokens.freqs[lo:hi]):
+                    tfs[aid] = tfs.get(aid, 0) + tf
+                    if base:
+                        weights[aid] = max(weights.get(aid, 0), w)
+            if not tfs:
+                continue
+            idf = math.log(1 + (self.article_count - len(tfs) + 0.5) / (len(tfs) + 0.5))
+            for aid, tf in tfs.items():
+                if aid in allowed:
+                    norm_len = 1 - b + b * self._doc_lengths[aid] / self.avg_doc_length
+                    scores[aid] += weights.get(aid, 1) * idf * tf * (k1 + 1) / (tf + k1 * norm_len)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+class _MappedBytes:
+    """نافذة على جزء من mmap بإزاحات نسبية: قص وبحث وقراءة بايت دون نسخ القسم كله"""
+
+    def __init__(self, mm, offset, length):
+        self._mm = mm
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._mm[self._offset + key.start:self._offset + key.stop]
+        return self._mm[self._offset + key]
+
+    def __bytes__(self):
+        return self._mm[self._offset:self._offset + self._length]
+
+    def find(self, needle, start=0, end=None):
+        end = self._length if end is None else end
+        pos = self._mm.find(needle, self._offset + start, self._offset + end)
+        return pos - self._offset if pos != -1 else -1
+
+
+def open_mapped_index(index_file=INDEX_FILE, dir_signature=None):
+    """الفهرس الثنائي إن وُجد وكان مطابقًا لحالة مجلد القوانين، وإلا None"""
+    try:
+        index = MappedLawIndex(index_file)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    if dir_signature is not None and index.dir_signature != tuple(dir_signature):
+        return None
+    return index
+
+
+def _compact_corpus(corpus, index):
+    """
+    نسخة من الملف المجمّع تشير مداخلها إلى مخازن ArticleStore في الفهرس بدل قوائم الفقرات،
+    فيبقى النص في الذاكرة مرة واحدة ويُكتب عند الحفظ بنفس الصيغة.
+    """
+    laws = {seg.file: dict(corpus["laws"][seg.file], articles=seg.store) for seg in index.segments}
+    return dict(corpus, laws=laws)
+
+
+def _build_mapped_index(laws_dir, corpus_file, workers, index_file, dir_signature):
+    """تحديث الملف المجمّع ثم بناء الفهرس منه وكتابته ثنائيًا؛ تعمل في عملية منفصلة (انظر LiveLawIndex)"""
+    corpus, errors = load_corpus(laws_dir, corpus_file, workers)
+    write_mapped_index(LawIndex(corpus, errors), index_file, dir_signature)
+
+
+class LiveLawIndex:
+    """
+    فهرس حيّ يراقب مجلد القوانين: عند إضافة ملف أو حذفه أو تعديله يُعاد تحليل
+    ذلك الملف فقط ويُبنى جزؤه من الفهرس، ثم يُستبدل current دفعة واحدة.
+    عمليات البحث الجارية تبقى على النسخة التي أخذتها من current.
+    مع index_file يكون current فهرسًا ثنائيًا (MappedLawIndex): يُفتح مباشرة إن كان مطابقًا
+    للمجلد دون قراءة الملف المجمّع، ولا يُحمَّل الملف المجمّع إلا عند إعادة البناء.
+    البناء نفسه يجري في عملية منفصلة تنتهي بعد كتابة الملف، فلا يبقى LawIndex ولا الملف المجمّع في ذاكرة
+    هذه العملية ولا تكبر بحجم المجموعة: كل إعادة بناء تفهرس كل الملفات من الملف المجمّع (دون إعادة تحليل
+    ملفات DOCX التي لم تتغير). أما دون index_file فيبقى آخر LawIndex هو current وتُعاد منه أجزاء الملفات التي لم تتغير.
+    """
+
+    def __init__(self, laws_dir=LAWS_DIR, corpus_file=CORPUS_FILE, workers=None, index_file=None):
+        self.laws_dir = laws_dir
+        self.corpus_file = corpus_file
+        self.workers = workers
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None  # آخر خطأ في إعادة البناء من المراقب (None بعد أي تحديث ناجح)
+        self._dir_signature = laws_dir_signature(laws_dir)
+        self._corpus = None  # دون index_file: الملف المجمّع للفهرس الحالي
+        if index_file:
+            self.current = open_mapped_index(index_file, self._dir_signature)
+            if self.current is not None:
+                return
+        with build_lock(index_file or corpus_file):
+            if index_file:
+                # عملية أخرى ربما بنت الفهرس أثناء انتظار القفل
+                self.current = open_mapped_index(index_file, self._dir_signature) or self._build_mapped()
+                return
+            corpus, errors = load_corpus(laws_dir, corpus_file, workers)
+            self._install(corpus, LawIndex(corpus, errors))
+
+    def _build_mapped(self):
+        # ذاكرة البناء تعود كلها للنظام بانتهاء العملية، وتبقى هذه العملية على صفحات الملف وحدها
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            pool.submit(_build_mapped_index, self.laws_dir, self.corpus_file, self.workers, self.index_file,
+                        self._dir_signature).result()
+        return MappedLawIndex(self.index_file)
+
+    def _install(self, corpus, index):
+        self.current, self._corpus = index, _compact_corpus(corpus, index)
+
+    def refresh(self):
+        """تحديث الفهرس إن تغيّر محتوى ملف في مجلد القوانين، وتُرجع True إن استُبدل الفهرس (لا عند لمس الملفات فقط)"""
+        with self._lock:
+            signature = laws_dir_signature(self.laws_dir)
+            if signature == self._dir_signature:
+                return False
+            with build_lock(self.index_file or self.corpus_file):
+                return self._rebuild(signature)
+
+    def _rebuild(self, signature):
+        self._dir_signature = signature
+        if self.index_file:
+            # عملية أخرى تشاركنا الملف ربما أعادت بناءه بالفعل فنفتح ما كتبته، وإلا نبنيه
+            mapped = open_mapped_index(self.index_file, signature) or self._build_mapped()
+            if (mapped.signature, mapped.errors) == (self.current.signature, self.current.errors):
+                return False
+            self.current = mapped
+            return True
+        corpus, errors, changed = update_corpus(self._corpus, self.laws_dir, self.workers)
+        if changed:
+            _write_corpus_file(corpus, self.corpus_file)
+        if (corpus_signature(corpus), errors) == (self.current.signature, self.current.errors):
+            # نفس المحتوى (نسخ أو لمس الملفات): نحفظ أوقات التعديل الجديدة فقط ويبقى الفهرس كما هو
+            self._corpus = _compact_corpus(corpus, self.current)
+            return False
+        self._install(corpus, LawIndex(corpus, errors, previous=self.current))
+        return True
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # المجلد قد يكون قيد النسخ، أو ملف تالف، أو فهرس ثنائي كتبته عملية أخرى للتو:
+                # نسجل الخطأ ونبقي الفهرس الحالي، ونعيد المحاولة في الدورة التالية بدل إيقاف المراقب
+                if repr(e) != self.last_error:
+                    WATCH_LOGGER.exception("تعذر تحديث فهرس القوانين")
+                self.last_error = repr(e)
+            else:
+                self.last_error = None
+
+    def start(self, interval=WATCH_INTERVAL):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, args=(interval,), name="laws-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class QueryCache:
+    """
+    ذاكرة مؤقتة LRU محدودة لنتائج البحث، مشتركة بين الجلسات.
+    كل مدخل مرتبط بتوقيع الفهرس الذي حُسب عليه، فإذا تغيّر ملف قانون
+    وتغيّر التوقيع أُفرغت الذاكرة كلها قبل أي قراءة أو كتابة.
+    """
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.signature = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sync(self, signature):
+        if signature != self.signature:
+            self._entries.clear()
+            self.signature = signature
+
+    def get(self, signature, key):
+        with self._lock:
+            self._sync(signature)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, signature, key, value):
+        with self._lock:
+            self._sync(signature)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+
+def _greedy_non_overlapping(spans):
+    """اختيار المطابقات غير المتداخلة من اليسار إلى اليمين كما يفعل re.finditer"""
+    chosen = []
+    last_end = -1
+    for s, e in spans:
+        if s >= last_end:
+            chosen.append((s, e))
+            last_end = e
+    return chosen
+
+
+class _Coverage:
+    """مجالات مغطاة غير متداخلة مرتبة، لفحص التداخل بالبحث الثنائي"""
+
+    def __init__(self, spans):
+        self.starts = []
+        self.ends = []
+        for s, e in sorted(spans):
+            if self.ends and s < self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], e)
+            else:
+                self.starts.append(s)
+                self.ends.append(e)
+
+    def overlaps(self, s, e):
+        idx = bisect.bisect_left(self.starts, e)
+        return idx > 0 and self.ends[idx - 1] > s
+
+    def add(self, s, e):
+        # يُستدعى فقط لمجال لا يتداخل مع المجالات الموجودة
+        idx = bisect.bisect_left(self.starts, s)
+        self.starts.insert(idx, s)
+        self.ends.insert(idx, e)
+
+
+@functools.lru_cache(maxsize=64)
+def _keyword_matchers(keywords):
+    literal = [re.compile(re.escape(kw), re.IGNORECASE) for kw in keywords]
+    whole = [re.compile(r'(?<!\w)' + re.escape(kw) + r'(?!\w)', re.IGNORECASE) for kw in keywords]
+    scanner = re.compile('(?=' + '|'.join(re.escape(kw) for kw in keywords if kw) + ')', re.IGNORECASE)
+    return literal, whole, scanner
+
+
+def highlight_keywords(text, keywords, normalized_keywords=None, exact_match=False):
+    """
+    تمييز الكلمات المطابقة تمامًا بعلامة <mark>
+    وتمييز الكلمات المطابقة جزئيًا (كلمة ضمن كلمة أخرى) بعلامة <mark class="mark-soft">
+    المطابقة الكلية: برتقالي - المطابقة الجزئية: أصفر
+    تُجمع كل الكلمات في تعبير واحد يمر على النص مرة واحدة لإيجاد مواضع بدايتها،
+    ثم تُحل التداخلات بنفس الأولوية السابقة: التامة أولًا ثم الجزئية بترتيب الكلمات.
+    """
+    if not keywords or not any(keywords):
+        return text
+    literal, whole, scanner = _keyword_matchers(tuple(keywords))
+
+    # مسح واحد: كل المواضع التي تبدأ عندها أي كلمة، ثم تحديد الكلمات المطابقة عند كل موضع
+    occurrences = [[] for _ in keywords]
+    exact_occurrences = [[] for _ in keywords]
+    for m in scanner.finditer(text):
+        pos = m.start()
+        for i, kw in enumerate(keywords):
+            if not kw:
+                continue
+            lm = literal[i].match(text, pos)
+            if lm:
+                occurrences[i].append((pos, lm.end()))
+                if whole[i].match(text, pos):
+                    exact_occurrences[i].append((pos, lm.end()))
+
+    # أولاً: المطابقات التامة
+    marked_spans = []
+    for i in range(len(keywords)):
+        for s, e in _greedy_non_overlapping(exact_occurrences[i]):
+            marked_spans.append((s, e, "exact"))
+
+    # ثانيًا: المطابقات الجزئية (وليس التامة)
+    if normalized_keywords and not exact_match:
+        coverage = _Coverage((s, e) for s, e, _ in marked_spans)
+        for i, norm_kw in enumerate(normalized_keywords):
+            if not norm_kw or not keywords[i]:
+                continue
+            for s, e in _greedy_non_overlapping(occurrences[i]):
+                if not coverage.overlaps(s, e):
+                    coverage.add(s, e)
+                    marked_spans.append((s, e, "partial"))
+
+    if not marked_spans:
+        return text
+    marked_spans.sort(key=lambda x: x[0])
+
+    result = []
+    last_idx = 0
+    for s, e, t in marked_spans:
+        if s < last_idx:
+            continue  # تجاوز التداخلات
+        result.append(text[last_idx:s])
+        span_text = text[s:e]
+        if t == "exact":
+            result.append(f"<mark>{span_text}</mark>")  # برتقالي
+        else:
+            result.append(f"<mark class=\"mark-soft\">{span_text}</mark>")  # أصفر
+        last_idx = e
+    result.append(text[last_idx:])
+    return "".join(result)
+
+
+_RAW_WORD_RE = re.compile(r'[\w\u0640\u064B-\u0652]+')
+
+
+def highlight_stems(text, keywords, morphology="stem"):
+    """تمييز الكلمات التي تشترك في الجذع (أو الجذر) مع إحدى كلمات البحث بعلامة <mark>، كما يطابقها البحث الصرفي"""
+    keys = {key for kw in keywords for word in normalize_arabic_text(kw).split()
+            for key in morphology_keys(word, morphology)}
+    if not keys:
+        return text
+    return _highlight_words(text, lambda word: morphology_key(word, morphology) in keys)
+
+
+def highlight_fuzzy(text, keywords, exact_match=False):
+    """تمييز الكلمات القريبة إملائيًا من إحدى كلمات البحث بعلامة <mark>، كما يطابقها البحث التقريبي (fuzzy_accepts)"""
+    accepts = [fuzzy_accepts(word, exact_match) for kw in keywords for word in normalize_arabic_text(kw).split()]
+    if not accepts:
+        return text
+    return _highlight_words(text, lambda word: any(accept(word) for accept in accepts))
+
+
+def _highlight_words(text, accept):
+    # accept(الكلمة المطبّعة) تُستدعى مرة لكل كلمة مختلفة، فالكلمات تتكرر كثيرًا في المادة الواحدة
+    words = list(_RAW_WORD_RE.finditer(text))
+    matched = {}
+    result = []
+    last_idx = 0
+    for m, word in zip(words, normalize_arabic_texts([m.group() for m in words])):
+        if word not in matched:
+            matched[word] = bool(word) and accept(word)
+        if matched[word]:
+            result.append(text[last_idx:m.start()])
+            result.append(f"<mark>{m.group()}</mark>")
+            last_idx = m.end()
+    result.append(text[last_idx:])
+    return "".join(result)
+
+
+# ----------------------------------------------------
+# قياس الأداء عند الطلب: أزمنة مراحل البحث ومحلل بأخذ العينات
+# ----------------------------------------------------
+
+TIMINGS_LOGGER = logging.getLogger("laws_engine.timings")
+
+
+class SearchTimer:
+    """أزمنة مراحل عملية واحدة (بالمللي ثانية) مع عدادات مثل عدد المرشحين والنتائج"""
+
+    enabled = True
+
+    def __init__(self, name="search"):
+        self.name = name
+        self.stages = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "stages": {k: round(v, 3) for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def log(self, logger=TIMINGS_LOGGER):
+        """سطر JSON واحد في السجل، ويُرجع نفس القاموس"""
+        record = self.as_dict()
+        logger.info(json.dumps(record, ensure_ascii=False))
+        return record
+
+
+class _NullTimer:
+    """بديل SearchTimer حين يكون القياس معطلًا: لا يسجل شيئًا ولا يكلف شيئًا"""
+
+    enabled = False
+    _null = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._null
+
+    def count(self, name, value):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class SamplingProfiler:
+    """
+    محلل أداء بأخذ العينات: خيط جانبي يقرأ مكدس الخيط المستهدف كل interval ثانية
+    ويعد تكرار كل مكدس. الناتج بصيغة المكدسات المطوية (flamegraph) أو أكثر الدوال استهلاكًا.
+    """
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, name="laws-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def collapsed(self):
+        """سطر لكل مكدس: الدوال مفصولة بـ ; ثم عدد العينات"""
+        return "\n".join(
+            f"{';'.join(f'{name} ({file}:{line})' for name, file, line in stack)} {n}"
+            for stack, n in self.samples.most_common()
+        )
+
+    def top(self, limit=20):
+        """أكثر الدوال ظهورًا في قمة المكدس: (الدالة، العينات، النسبة المئوية)"""
+        total = sum(self.samples.values()) or 1
+        leaves = Counter()
+        for stack, n in self.samples.items():
+            name, file, _ = stack[-1]
+            leaves[f"{name} ({file})"] += n
+        return [(name, n, round(100 * n / total, 1)) for name, n in leaves.most_common(limit)]
+
+
+# ----------------------------------------------------
+# الاستعلام المنطقي: AND / OR / NOT والعبارات والقرب، يُقيَّم كعمليات على قوائم المواقع في الفهرس
+# دون إعادة فحص النصوص. الصيغة:
+#   عقد AND بيع        أو  عقد و بيع           المادتان تحتويان الكلمتين
+#   عقد OR إيجار       أو  عقد أو إيجار ، أو فاصلة كما في البحث العادي
+#   عقد NOT إيجار      أو  عقد ليس إيجار
+#   "المحكمة المختصة"  عبارة بكلمات كاملة متتالية (أيضًا «...» و “...”)
+#   دعوى NEAR/5 نيابة  أو  دعوى قرب/5 نيابة     بينهما 5 كلمات على الأكثر (NEAR وحدها = QUERY_NEAR_DISTANCE)
+#   والأقواس للتجميع. الكلمات المتتالية دون عامل بينها عبارة واحدة كما في البحث العادي،
+#   وتتبع خيار التطابق التام؛ أما العبارة بين علامتي تنصيص فمطابقتها تامة دائمًا.
+# ----------------------------------------------------
+
+QUERY_NEAR_DISTANCE = 5
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|«([^»]*)»|“([^”]*)”|([()])|([,،])|([^\s"«»“”(),،]+)')
+_QUERY_OPERATORS = {"AND": "and", "و": "and", "OR": "or", "أو": "or", "او": "or", "NOT": "not", "ليس": "not"}
+_QUERY_NEAR_RE = re.compile(r'(?:NEAR|قرب)(?:/(\d+))?$', re.IGNORECASE)
+
+
+def _query_tokens(text):
+    """[(النوع, القيمة, النص كما كُتب)]"""
+    tokens = []
+    for m in _QUERY_TOKEN_RE.finditer(text):
+        raw = m.group(0)
+        quoted = next((g for g in m.groups()[:3] if g is not None), None)
+        if quoted is not None:
+            tokens.append(("quoted", quoted, raw))
+        elif m.group(4):
+            tokens.append((raw, None, raw))
+        elif m.group(5):
+            tokens.append(("or", None, raw))
+        else:
+            near = _QUERY_NEAR_RE.match(normalize_arabic_numbers(raw))
+            if near:
+                tokens.append(("near", int(near.group(1)) if near.group(1) else QUERY_NEAR_DISTANCE, raw))
+            else:
+                tokens.append((_QUERY_OPERATORS.get(raw.upper(), "word"), raw, raw))
+    return tokens
+
+
+class _QueryParser:
+    """
+    تحليل تنازلي بأولوية: OR ثم AND/NOT ثم NEAR. العُقد tuples:
+    ("phrase", الكلمات المطبّعة, النص الأصلي, منصّصة؟) و ("and", [..]) و ("or", [..])
+    و ("not", عقدة) و ("near", عبارة, عبارة, المسافة)
+    """
+
+    def __init__(self, text):
+        self.tokens = _query_tokens(text)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def _unexpected(self):
+        if self.pos >= len(self.tokens) or self._peek() == ")":
+            return ValueError("استعلام غير صالح: ينقص كلمة أو عبارة")
+        return ValueError(f"استعلام غير صالح: «{self.tokens[self.pos][2]}» في غير موضعه")
+
+    def parse(self):
+        if all(kind == "or" for kind, _, _ in self.tokens):
+            return None
+        node = self._or()
+        if self._peek() == ")":
+            raise ValueError("استعلام غير صالح: قوس زائد")
+        if self.pos < len(self.tokens):
+            raise self._unexpected()
+        return node
+
+    def _or(self):
+        nodes = []
+        while True:
+            while self._peek() == "or":
+                self._next()  # فواصل زائدة كما في البحث العادي
+            if nodes and self._peek() in (None, ")"):
+                break
+            nodes.append(self._and())
+            if self._peek() != "or":
+                break
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def _and(self):
+        nodes = [self._unary()]
+        while True:
+            kind = self._peek()
+            if kind == "and":
+                self._next()
+                nodes.append(self._unary())
+            elif kind == "not":
+                self._next()
+                nodes.append(("not", self._unary()))
+            elif kind in ("word", "quoted", "("):
+                nodes.append(self._unary())  # عنصران متجاوران دون عامل: AND
+            else:
+                break
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def _unary(self):
+        if self._peek() == "not":
+            self._next()
+            return ("not", self._unary())
+        return self._near()
+
+    def _near(self):
+        node = self._primary()
+        while self._peek() == "near":
+            distance = self._next()[1]
+            right = self._primary()
+            if node[0] != "phrase" or right[0] != "phrase":
+                raise ValueError("استعلام غير صالح: القرب يكون بين كلمتين أو عبارتين فقط")
+            node = ("near", node, right, distance)
+        return node
+
+    def _primary(self):
+        kind = self._peek()
+        if kind == "(":
+            self._next()
+            node = self._or()
+            if self._peek() != ")":
+                raise ValueError("استعلام غير صالح: قوس غير مغلق") if self._peek() is None else self._unexpected()
+            self._next()
+            return node
+        if kind == "quoted":
+            raw = self._next()[1]
+            return ("phrase", tuple(normalize_arabic_text(raw).split()), raw, True)
+        if kind == "word":
+            raw = []
+            while self._peek() == "word":
+                raw.append(self._next()[1])
+            raw = " ".join(raw)
+            return ("phrase", tuple(normalize_arabic_text(raw).split()), raw, False)
+        raise self._unexpected()
+
+
+def parse_query(text):
+    """شجرة الاستعلام المنطقي، أو None لاستعلام فارغ. ترفع ValueError عند خطأ في الصيغة."""
+    return _QueryParser(text or "").parse()
+
+
+def query_keywords(node):
+    """العبارات المطلوبة (خارج NOT) بنصها الأصلي: للتمييز والترتيب"""
+    if node is None or node[0] == "not":
+        return []
+    if node[0] == "phrase":
+        return [node[2]] if node[1] else []
+    children = node[1:3] if node[0] == "near" else node[1]
+    keywords = []
+    for child in children:
+        for kw in query_keywords(child):
+            if kw not in keywords:
+                keywords.append(kw)
+    return keywords
+
+
+class _QueryEvaluator:
+    """
+    تقييم الشجرة على index (LawIndex أو MappedLawIndex) عبر token_matches و token_positions.
+    كل عقدة تُقيَّم داخل within (مجموعة المواد الممكنة حتى الآن أو None للكل):
+    في AND تُقيَّم الأرخص أولًا (أقل عدد مواد) ثم البقية داخل نتيجتها فقط،
+    وفي العبارة تُقرأ مواقع أندر كلماتها أولًا ثم مواقع البقية في المواد المتبقية.
+    مع morphology ("stem" أو "root") تطابق كل كلمة غير منصّصة ما يشترك معها في الجذع أو الجذر،
+    ومع fuzzy ما يطابقها عاديًا أو يختلف جذعه عن جذعها بخطأ إملائي أو خطأين.
+    """
+
+    def __init__(self, index, exact_match=False, morphology=None, fuzzy=False):
+        self.index = index
+        self.exact_match = exact_match
+        self.morphology = morphology
+        self.fuzzy = fuzzy
+        self._matches = {}
+
+    def _modes(self, node):
+        _, words, _, quoted = node
+        if quoted:
+            return ["exact"] * len(words)
+        if self.morphology:
+            return [self.morphology] * len(words)
+        if self.exact_match:
+            modes = ["exact"] * len(words)
+        elif len(words) == 1:
+            modes = ["contains"]
+        else:
+            # عبارة جزئية = نص متصل: أولها نهاية كلمة، وآخرها بداية كلمة، وما بينهما كلمات كاملة
+            modes = ["suffix"] + ["exact"] * (len(words) - 2) + ["prefix"]
+        # التقريبية فوق الطريقة العادية نفسها، فتبقى كل مطابقة عادية
+        return [fuzzy_mode(mode) for mode in modes] if self.fuzzy else modes
+
+    def _word_matches(self, word, mode):
+        key = (word, mode)
+        if key not in self._matches:
+            self._matches[key] = self.index.token_matches(word, mode)
+        return self._matches[key]
+
+    def cost(self, node):
+        """تقدير عدد المواد التي تمر بها العقدة، لترتيب التقييم"""
+        kind = node[0]
+        if kind == "phrase":
+            if not node[1]:
+                return 0
+            return min(sum(df for _, df in self._word_matches(w, m)) for w, m in zip(node[1], self._modes(node)))
+        if kind == "near":
+            return min(self.cost(node[1]), self.cost(node[2]))
+        if kind == "or":
+            return sum(self.cost(child) for child in node[1])
+        if kind == "and":
+            positive = [self.cost(child) for child in node[1] if child[0] != "not"]
+            return min(positive) if positive else self.index.article_count
+        return self.index.article_count
+
+    def phrase_positions(self, node, within=None):
+        """{رقم المادة: [مواقع بداية العبارة]}"""
+        words, modes = node[1], self._modes(node)
+        if not words:
+            return {}
+        matches = [self._word_matches(w, m) for w, m in zip(words, modes)]
+        order = sorted(range(len(words)), key=lambda i: sum(df for _, df in matches[i]))
+        positions = {}
+        for i in order:
+            found = self.index.token_positions([handle for handle, _ in matches[i]], within)
+            if not found:
+                return {}
+            positions[i] = found
+            within = found.keys()
+        if len(words) == 1:
+            return positions[0]
+        first = order[0]
+        starts = {}
+        for aid in within:
+            others = [(i - first, set(positions[i][aid])) for i in order[1:]]
+            hits = [p - first for p in positions[first][aid] if all(p + shift in ps for shift, ps in others)]
+            if hits:
+                starts[aid] = hits
+        return starts
+
+    def ids(self, node, within=None):
+        """المواد المطابقة للعقدة، وهي دائمًا جزء من within"""
+        kind = node[0]
+        if kind == "phrase":
+            return set(self.phrase_positions(node, within))
+        if kind == "near":
+            return self._near(node, within)
+        if kind == "or":
+            result = set()
+            for child in node[1]:
+                result |= self.ids(child, within)
+            return result
+        if kind == "not":
+            base = set(within if within is not None else range(self.index.article_count))
+            return base - self.ids(node[1], base)
+        positive = sorted((child for child in node[1] if child[0] != "not"), key=self.cost)
+        result = set(within if within is not None else range(self.index.article_count)) if not positive else None
+        for child in positive:
+            result = self.ids(child, within if result is None else result)
+            if not result:
+                return set()
+        for child in node[1]:
+            if child[0] == "not" and result:
+                result -= self.ids(child[1], result)
+        return result
+
+    def _near(self, node, within):
+        _, left, right, distance = node
+        if self.cost(right) < self.cost(left):
+            left, right = right, left
+        left_positions = self.phrase_positions(left, within)
+        if not left_positions:
+            return set()
+        right_positions = self.phrase_positions(right, left_positions.keys())
+        left_len, right_len = len(left[1]), len(right[1])
+        result = set()
+        for aid, rights in right_positions.items():
+            for p in left_positions[aid]:
+                # بين نهاية إحدى العبارتين وبداية الأخرى distance كلمة على الأكثر، بأي ترتيب
+                if bisect.bisect_left(rights, p - distance - right_len) < bisect.bisect_right(rights, p + left_len + distance):
+                    result.add(aid)
+                    break
+        return result
+
+
+def match_query(index, node, exact_match=False, files=None, morphology=None, fuzzy=False):
+    """أرقام المواد المطابقة لشجرة parse_query داخل القوانين المحددة (أو كلها)"""
+    if node is None:
+        return set()
+    within = None if files is None else set(index.article_ids(files))
+    return _QueryEvaluator(index, exact_match, morphology, fuzzy).ids(node, within)
+
+
+# ----------------------------------------------------
+# البحث: نفس المسار الذي تستخدمه الواجهة وسطر الأوامر
+# ----------------------------------------------------
+
+def split_keywords(text):
+    """تقسيم نص البحث إلى كلمات مفصولة بفاصلة كما تُكتب في مربع البحث"""
+    return [k.strip() for k in text.split(",") if k.strip()] if text else []
+
+
+def load_index(laws_dir=LAWS_DIR, corpus_file=CORPUS_FILE, workers=None, index_file=None):
+    """
+    فهرس ثابت لمرة واحدة (دون مراقبة المجلد) للسكربتات وسطر الأوامر.
+    مع index_file يُفتح الفهرس الثنائي إن كان مطابقًا للمجلد، وإلا يُبنى ويُكتب أولًا.
+    """
+    if index_file:
+        dir_signature = laws_dir_signature(laws_dir)
+        index = open_mapped_index(index_file, dir_signature)
+        if index is not None:
+            return index
+    with build_lock(index_file or corpus_file):
+        if index_file:
+            index = open_mapped_index(index_file, dir_signature)
+            if index is not None:
+                return index
+        corpus, errors = load_corpus(laws_dir, corpus_file, workers)
+        index = LawIndex(corpus, errors)
+        if index_file:
+            write_mapped_index(index, index_file, dir_signature)
+            return MappedLawIndex(index_file)
+    return index
+
+
+def resolve_law(index, law):
+    """
+    قبول اسم الملف أو اسم القانون دون الامتداد.
+    تُرجع None (كل القوانين) إن لم يُحدد قانون، وترفع KeyError إن لم يوجد.
+    """
+    if not law:
+        return None
+    for file in index.files:
+        if law in (file, law_name(file)):
+            return [file]
+    raise KeyError(law)
+
+
+def list_laws(index):
+    """القوانين المفهرسة وعدد مواد كل منها"""
+    return [{"file": file, "law": law_name(file), "articles": len(index.article_ids([file]))} for file in index.files]
+
+
+def find_articles(index, number, files=None):
+    """المواد التي تحمل رقمًا معينًا (بأرقام عربية أو إنجليزية) بنصها الكامل والإحالات منها وإليها"""
+    records = []
+    for aid in index.lookup_article(normalize_arabic_numbers(number.strip()), files):
+        file, num, text = index.article(aid)
+        records.append(dict({"law": law_name(file), "num": num, "text": text}, **article_links(index, aid)))
+    return records
+
+
+def article_links(index, aid):
+    """{"cites": [..], "cited_by": [..]} بالقانون ورقم المادة لكل إحالة من المادة وإليها"""
+    def refs(ids):
+        return [{"law": law_name(index.file_of(i)), "num": index.num_of(i)} for i in ids]
+    return {"cites": refs(index.cites(aid)), "cited_by": refs(index.cited_by(aid))}
+
+
+def _boolean_query(keywords):
+    # في الاستعلام المنطقي الفاصلة عامل OR، فتُجمع الأجزاء كما كُتبت في مربع البحث
+    return parse_query(",".join(keywords))
+
+
+def _phrases_query(keywords, normalized_keywords):
+    # البحث العادي كشجرة استعلام: كل كلمة أو عبارة من مربع البحث عبارة مستقلة، يجمعها OR
+    phrases = [("phrase", tuple(norm.split()), kw, False) for kw, norm in zip(keywords, normalized_keywords) if norm]
+    return ("or", phrases) if phrases else None
+
+
+def search_article_ids(index, files=None, keywords=(), article="", exact_match=False, rank=False,
+                       top_k=TOP_K_RESULTS, timer=NULL_TIMER, boolean=False, morphology=None, fuzzy=False):
+    """
+    البحث بالكلمات و/أو برقم المادة داخل القوانين المحددة (أو كلها).
+    تُرجع (ids, total_matches) حيث ids أرقام المواد التسلسلية في index بترتيب العرض.
+    عند rank تأتي المواد المطلوبة برقمها أولًا ثم أفضل top_k مادة حسب الأهمية.
+    مع boolean تُعامل الكلمات كاستعلام منطقي (parse_query) وترفع ValueError إن كانت صيغته خاطئة.
+    مع morphology ("stem" أو "root") تطابق الكلمات صيغها الأخرى: "عقد" تطابق "العقد" و "بعقده" ("العقود" مع root).
+    مع fuzzy تطابق الكلمات ما تطابقه عاديًا وما يختلف جذعه بخطأ إملائي أو خطأين (fuzzy_max_distance):
+    "الحظانة" تطابق "الحضانة"، وتأتي النتائج دون rank بترتيب عدد الأخطاء.
+    timer (SearchTimer) اختياري لتسجيل زمن كل مرحلة.
+    """
+    if morphology and morphology not in MORPHOLOGY_MODES:
+        raise ValueError(f"نوع البحث الصرفي غير معروف: {morphology}")
+    files = index.files if files is None else list(files)
+    with timer.stage("normalize"):
+        query = _boolean_query(keywords) if boolean else None
+        if boolean:
+            keywords = query_keywords(query)
+        normalized_keywords = [normalize_arabic_text(kw) for kw in keywords]
+        if (morphology or fuzzy) and not boolean:
+            query = _phrases_query(keywords, normalized_keywords)
+        article = normalize_arabic_numbers(article.strip()) if article else ""
+    scope = {index.files.index(file) for file in files if file in index.law_ranges}
+    with timer.stage("article_lookup"):
+        number_hits = index.lookup_article(article, files) if article else []
+    with timer.stage("match"):
+        if boolean or morphology or fuzzy:
+            keyword_hits = match_query(index, query, exact_match, files, morphology, fuzzy)
+        elif normalized_keywords:
+            keyword_hits = index.match_keywords(normalized_keywords, exact_match=exact_match)
+        else:
+            keyword_hits = set()
+        candidates = len(keyword_hits)
+        keyword_hits = {aid for aid in keyword_hits if index.law_ids[aid] in scope}
+    with timer.stage("rank"):
+        if rank and keyword_hits:
+            # المواد المطلوبة برقمها أولًا، ثم أفضل المواد حسب الأهمية دون تمييز البقية
+            keyword_hits.difference_update(number_hits)
+            ranked = index.rank(keyword_hits, normalized_keywords, exact_match=exact_match, top_k=top_k,
+                                morphology=morphology, fuzzy=fuzzy)
+            ordered = number_hits + [aid for aid, _ in ranked]
+            total_matches = len(number_hits) + len(keyword_hits)
+        else:
+            ordered = sorted(keyword_hits.union(number_hits))
+            total_matches = len(ordered)
+            if fuzzy and not morphology and keyword_hits:
+                # دون الترتيب حسب الأهمية: الأقل أخطاءً أولًا، وبترتيب المواد داخل كل عدد من الأخطاء
+                distances = index.fuzzy_distances(keyword_hits, normalized_keywords, exact_match)
+                ordered.sort(key=lambda aid: distances.get(aid, 0))
+    if timer.enabled:
+        timer.count("articles_in_scope", len(index.article_ids(files)))
+        timer.count("candidates", candidates + len(number_hits))
+        timer.count("matches", total_matches)
+        timer.count("results", len(ordered))
+    return ordered, total_matches
+
+
+def article_results(index, ids, keywords=(), exact_match=False, highlight=True, timer=NULL_TIMER, boolean=False,
+                    morphology=None, fuzzy=False):
+    """
+    نتائج العرض لأرقام مواد معينة: قاموس لكل مادة فيه law و num و plain،
+    و text (مميّز بـ <mark> عند highlight)، و cites و cited_by (article_links). يُستدعى عند العرض للصفحة المعروضة فقط.
+    مع boolean تُميَّز العبارات المطلوبة في الاستعلام المنطقي دون ما بعد NOT،
+    ومع morphology تُميَّز الكلمات التي تشترك معها في الجذع أو الجذر (highlight_stems)، ومع fuzzy القريبة منها (highlight_fuzzy).
+    """
+    keywords = query_keywords(_boolean_query(keywords)) if boolean else list(keywords)
+    normalized_keywords = [normalize_arabic_text(kw) for kw in keywords]
+    results = []
+    with timer.stage("highlight"):
+        for aid in ids:
+            file, num, full_text = index.article(aid)
+            if highlight and keywords and morphology:
+                text = highlight_stems(full_text, keywords, morphology)
+            elif highlight and keywords and fuzzy:
+                text = highlight_fuzzy(full_text, keywords, exact_match)
+            elif highlight and keywords:
+                text = highlight_keywords(full_text, keywords, normalized_keywords=normalized_keywords, exact_match=exact_match)
+            else:
+                text = full_text
+            results.append(dict({
+                "law": law_name(file),
+                "num": num,
+                "text": text,
+                "plain": full_text
+            }, **article_links(index, aid)))
+    return results
+
+
+def search_laws(index, files=None, keywords=(), article="", exact_match=False, rank=False,
+                top_k=TOP_K_RESULTS, highlight=True, timer=NULL_TIMER, boolean=False, morphology=None, fuzzy=False):
+    """
+    مثل search_article_ids لكن تُرجع (results, total_matches) بنتائج كاملة من article_results.
+    """
+    ids, total_matches = search_article_ids(index, files, keywords, article, exact_match, rank, top_k, timer, boolean,
+                                            morphology, fuzzy)
+    return article_results(index, ids, keywords, exact_match, highlight, timer, boolean, morphology, fuzzy), total_matches
+
+
+def _query_key(index, files, keywords, article, exact_match, rank, top_k, boolean=False, morphology=None, fuzzy=False):
+    # الكلمات الأصلية جزء من المفتاح لأن التمييز يتم على النص كما كُتب
+    files = index.files if files is None else list(files)
+    return (tuple(files), tuple(keywords), normalize_arabic_numbers(article.strip()) if article else "",
+            exact_match, rank, top_k, boolean, morphology, fuzzy)
+
+
+def _canonical_query(node):
+    # شجرة الاستعلام المنطقي دون النص الأصلي للعبارات، فلا يبقى فيها إلا ما تتوقف عليه المطابقة
+    if node is None:
+        return None
+    if node[0] == "phrase":
+        return ("phrase", node[1], node[3])
+    if node[0] == "not":
+        return ("not", _canonical_query(node[1]))
+    if node[0] == "near":
+        return ("near", _canonical_query(node[1]), _canonical_query(node[2]), node[3])
+    return (node[0], tuple(_canonical_query(child) for child in node[1]))
+
+
+def _ids_query_key(index, files, keywords, article, exact_match, rank, top_k, boolean=False, morphology=None,
+                   fuzzy=False):
+    # أرقام المواد لا تتوقف إلا على الكلمات المطبّعة: "الزوجة" و "الزوجه"، و "إلتزام" و "التزام"، مفتاح واحد
+    if boolean:
+        keywords = [_canonical_query(_boolean_query(keywords))]
+    else:
+        keywords = [kw for kw in normalize_arabic_texts(keywords) if kw]
+    return _query_key(index, files, keywords, article, exact_match, rank, top_k, boolean, morphology, fuzzy)
+
+
+def cached_search_article_ids(cache, index, files=None, keywords=(), article="", exact_match=False, rank=False,
+                              top_k=TOP_K_RESULTS, timer=NULL_TIMER, boolean=False, morphology=None, fuzzy=False):
+    """
+    مثل search_article_ids مع ذاكرة QueryCache؛ تُحفظ الأرقام فقط في array مضغوطة.
+    المفتاح من الكلمات المطبّعة، فصيغ الكتابة المختلفة للاستعلام نفسه تشترك في المدخل.
+    """
+    with timer.stage("cache_lookup"):
+        key = ("ids",) + _ids_query_key(index, files, keywords, article, exact_match, rank, top_k, boolean, morphology,
+                                        fuzzy)
+        cached = cache.get(index.signature, key)
+    timer.count("cache_hit", cached is not None)
+    if cached is None:
+        ids, total_matches = search_article_ids(index, files, keywords, article, exact_match, rank, top_k, timer, boolean,
+                                                morphology, fuzzy)
+        cached = (array("I", ids), total_matches)
+        cache.put(index.signature, key, cached)
+    elif timer.enabled:
+        timer.count("results", len(cached[0]))
+    return cached
+
+
+def cached_search_laws(cache, index, files=None, keywords=(), article="", exact_match=False, rank=False,
+                       top_k=TOP_K_RESULTS, highlight=True, timer=NULL_TIMER, boolean=False, morphology=None,
+                       fuzzy=False):
+    """مثل search_laws مع ذاكرة QueryCache تحفظ النتائج كاملة مع التمييز"""
+    key = ("results", highlight) + _query_key(index, files, keywords, article, exact_match, rank, top_k, boolean,
+                                              morphology, fuzzy)
+    with timer.stage("cache_lookup"):
+        cached = cache.get(index.signature, key)
+    timer.count("cache_hit", cached is not None)
+    if cached is None:
+        results, total_matches = search_laws(index, files, keywords, article, exact_match, rank, top_k, highlight, timer,
+                                             boolean, morphology, fuzzy)
+        cached = (tuple(results), total_matches)
+        cache.put(index.signature, key, cached)
+    elif timer.enabled:
+        timer.count("results", len(cached[0]))
+    return list(cached[0]), cached[1]
+
+
+# ----------------------------------------------------
+# تصدير النتائج: تُكتب الملفات تدريجيًا دون بناء المستند كاملًا في الذاكرة
+# ----------------------------------------------------
+
+EXPORT_TITLE = "نتائج البحث في القوانين اليمنية"
+EXPORT_EMPTY = "لم يتم العثور على نتائج للكلمات المفتاحية المحددة."
+
+_XML_INVALID_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff￾￿]')
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{_OFFICE_DOCUMENT_REL}" Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCX_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+_DOCX_TAIL = '<w:sectPr/></w:body></w:document>'
+_DOCX_PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def _docx_paragraph(text, size=None):
+    """فقرة من اليمين لليسار، الأسطر مفصولة بـ w:br والمسافات الجدولية بـ w:tab كما في python-docx"""
+    rpr = '<w:rtl/>' if size is None else f'<w:b/><w:bCs/><w:sz w:val="{size}"/><w:szCs w:val="{size}"/><w:rtl/>'
+    content = []
+    for i, line in enumerate(_XML_INVALID_RE.sub('', text).split('\n')):
+        if i:
+            content.append('<w:br/>')
+        for j, chunk in enumerate(line.split('\t')):
+            if j:
+                content.append('<w:tab/>')
+            if chunk:
+                content.append(f'<w:t xml:space="preserve">{xml_escape(chunk)}</w:t>')
+    return f'<w:p><w:pPr><w:bidi/></w:pPr><w:r><w:rPr>{rpr}</w:rPr>{"".join(content)}</w:r></w:p>'
+
+
+def iter_export_results(index, ids):
+    """
+    نتائج التصدير لأرقام مواد، مادة بعد مادة: law و num و plain فقط، دون تمييز ولا إحالات،
+    فلا تُبنى قائمة النتائج كاملة قبل الكتابة ولا يُحسب ما لا يظهر في الملف.
+    """
+    for aid in ids:
+        file, num, plain = index.article(aid)
+        yield {"law": law_name(file), "num": num, "plain": plain}
+
+
+def iter_results_docx_xml(results):
+    """أجزاء word/document.xml لمستند النتائج، مادة بعد مادة (results أي iterable)"""
+    yield _DOCX_HEAD
+    yield _docx_paragraph(EXPORT_TITLE, size=32)
+    empty = True
+    for r in results:
+        if not empty:
+            yield _DOCX_PAGE_BREAK
+        empty = False
+        yield _docx_paragraph(f"القانون: {r['law']} - المادة: {r['num']}", size=28)
+        yield _docx_paragraph(r['plain'])
+    if empty:
+        yield _docx_paragraph(EXPORT_EMPTY)
+    yield _DOCX_TAIL
+
+
+def write_results_docx(results, out):
+    """كتابة مستند Word للنتائج في ملف ثنائي مفتوح للكتابة، جزءًا بعد جزء"""
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _DOCX_RELS)
+        with zf.open("word/document.xml", "w") as part:
+            for chunk in iter_results_docx_xml(results):
+                part.write(chunk.encode("utf-8"))
+
+
+def iter_results_text(results):
+    """النتائج نصًّا عاديًا، مادة بعد مادة"""
+    yield EXPORT_TITLE + "\n\n"
+    empty = True
+    for r in results:
+        empty = False
+        yield f"القانون: {r['law']} - المادة: {r['num']}\n{r['plain']}\n\n"
+    if empty:
+        yield EXPORT_EMPTY + "\n"
+
+
+def iter_results_html(results):
+    """النتائج صفحة HTML مستقلة من اليمين لليسار، مادة بعد مادة"""
+    yield (
+        '<!DOCTYPE html>\n<html lang="ar" dir="rtl"><head><meta charset="utf-8">'
+        f'<title>{EXPORT_TITLE}</title>'
+        '<style>body{font-family:Tahoma,Arial,sans-serif;line-height:1.8;margin:2em;}'
+        'article{border-bottom:1px solid #ccc;padding:1em 0;}h2{color:#1976d2;font-size:1.2em;}</style>'
+        f'</head><body><h1>{EXPORT_TITLE}</h1>\n'
+    )
+    empty = True
+    for r in results:
+        empty = False
+        body = html_escape(r['plain']).replace('\n', '<br>\n')
+        yield f"<article><h2>القانون: {html_escape(r['law'])} - المادة: {html_escape(r['num'])}</h2><p>{body}</p></article>\n"
+    if empty:
+        yield f'<p>{EXPORT_EMPTY}</p>\n'
+    yield '</body></html>\n'
+
+
+def write_results_text(chunks, out):
+    """كتابة أجزاء نصية (من iter_results_text أو iter_results_html) في ملف ثنائي بترميز UTF-8"""
+    for chunk in chunks:
+        out.write(chunk.encode("utf-8"))
+
+
+# ----------------------------------------------------
+# سطر الأوامر: python laws_engine.py {build,laws,search,article,batch} ...
+# المخرجات JSON على stdout
+# ----------------------------------------------------
+
+def _print_json(data, pretty=True):
+    print(json.dumps(data, ensure_ascii=False, indent=2 if pretty else None))
+
+
+def _search_output(index, args, query):
+    timer = SearchTimer("cli") if args.timings else NULL_TIMER
+    boolean = query.get("boolean", False)
+    keywords = query.get("keywords", "")
+    results, total_matches = search_laws(
+        index,
+        resolve_law(index, query.get("law")),
+        [keywords] if boolean else split_keywords(keywords),
+        query.get("article", ""),
+        exact_match=query.get("exact", False),
+        rank=query.get("rank", False),
+        top_k=query.get("top_k", args.top_k),
+        highlight=args.highlight,
+        timer=timer,
+        boolean=boolean,
+        morphology=query.get("morphology"),
+        fuzzy=query.get("fuzzy", False),
+    )
+    if not args.highlight:
+        for r in results:
+            del r["text"]
+    output = {"query": query, "total_matches": total_matches, "results": results}
+    if timer.enabled:
+        output["timings"] = timer.as_dict()
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="laws_engine", description="محرك البحث في القوانين اليمنية دون واجهة")
+    parser.add_argument("--laws-dir", default=LAWS_DIR)
+    parser.add_argument("--corpus-file", default=CORPUS_FILE)
+    parser.add_argument("--workers", type=int, default=None, help="عدد العمليات عند تحليل الملفات")
+    parser.add_argument("--index-file", default=INDEX_FILE, help="الفهرس الثنائي المفتوح بـ mmap")
+    parser.add_argument("--no-mmap", action="store_true", help="بناء الفهرس في الذاكرة بدل الفهرس الثنائي")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="بناء الملف المجمّع والفهرس الثنائي أو تحديثهما")
+    sub.add_parser("laws", help="قائمة القوانين وعدد موادها")
+
+    p = sub.add_parser("search", help="البحث بالكلمات و/أو رقم المادة")
+    p.add_argument("keywords", nargs="?", default="", help="كلمات مفصولة بفاصلة")
+    p.add_argument("--law", help="اسم ملف القانون أو اسم القانون (الافتراضي: الكل)")
+    p.add_argument("--article", default="", help="رقم المادة")
+    p.add_argument("--exact", action="store_true", help="تطابق تام للكلمة")
+    p.add_argument("--rank", action="store_true", help="ترتيب حسب الأهمية")
+    p.add_argument("--boolean", action="store_true", help="استعلام منطقي: AND / OR / NOT و\"عبارة\" و NEAR/5")
+    p.add_argument("--morphology", choices=MORPHOLOGY_MODES, help="بحث صرفي: بالجذع (stem) أو بالجذر التقريبي (root)")
+    p.add_argument("--fuzzy", action="store_true", help="بحث تقريبي يتحمل خطأ أو خطأين إملائيين في كل كلمة")
+
+    p = sub.add_parser("article", help="عرض مادة برقمها")
+    p.add_argument("number")
+    p.add_argument("--law", help="اسم ملف القانون أو اسم القانون (الافتراضي: الكل)")
+
+    p = sub.add_parser("batch", help="تنفيذ استعلامات JSON (سطر لكل استعلام) من ملف أو stdin")
+    p.add_argument("queries", nargs="?", default="-",
+                   help='ملف فيه سطر JSON لكل استعلام بالحقول keywords, law, article, exact, rank, top_k, boolean, morphology, fuzzy')
+
+    for name in ("search", "batch"):
+        sub.choices[name].add_argument("--top-k", type=int, default=TOP_K_RESULTS)
+        sub.choices[name].add_argument("--highlight", action="store_true", help="إرجاع النص مميزًا بـ <mark>")
+        sub.choices[name].add_argument("--timings", action="store_true", help="إضافة أزمنة مراحل البحث إلى المخرجات")
+    args = parser.parse_args(argv)
+
+    index_file = None if args.no_mmap else args.index_file
+    if args.command == "build":
+        with build_lock(index_file or args.corpus_file):
+            corpus, errors = load_corpus(args.laws_dir, args.corpus_file, args.workers)
+            if index_file:
+                write_mapped_index(LawIndex(corpus, errors), index_file, laws_dir_signature(args.laws_dir))
+        _print_json({
+            "corpus_file": args.corpus_file,
+            "index_file": index_file,
+            "laws": {file: len(entry["articles"]) for file, entry in corpus["laws"].items()},
+            "errors": errors,
+        })
+        return 1 if errors else 0
+
+    index = load_index(args.laws_dir, args.corpus_file, args.workers, index_file)
+    try:
+        _run_query_command(index, args)
+    except KeyError as e:
+        raise SystemExit(f"القانون غير موجود: {e.args[0]}")
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return 0
+
+
+def _run_query_command(index, args):
+    if args.command == "laws":
+        _print_json({"laws": list_laws(index), "errors": index.errors})
+    elif args.command == "search":
+        query = {"keywords": args.keywords, "law": args.law, "article": args.article, "exact": args.exact, "rank": args.rank,
+                 "boolean": args.boolean, "morphology": args.morphology, "fuzzy": args.fuzzy}
+        _print_json(_search_output(index, args, query))
+    elif args.command == "article":
+        _print_json(find_articles(index, args.number, resolve_law(index, args.law)))
+    elif args.command == "batch":
+        if args.queries == "-":
+            # stdin ليس ملفنا فلا نغلقه
+            _run_batch(index, args, sys.stdin)
+        else:
+            with open(args.queries, encoding="utf-8") as stream:
+                _run_batch(index, args, stream)
+
+
+def _run_batch(index, args, lines):
+    for line in lines:
+        if line.strip():
+            _print_json(_search_output(index, args, json.loads(line)), pretty=False)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
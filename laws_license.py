@@ -0,0 +1,231 @@
+import os
+import csv
+import time
+import shutil
+import logging
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+# ----------------------------------------------------
+# سجل التفعيل والفترة التجريبية في قاعدة SQLite محلية (وضع WAL):
+# - trials: الجهاز ← وقت بدء التجربة (مفتاح أساسي، فالبحث بالجهاز لا يمر على كل السجلات)
+# - codes: كود التفعيل ← الجهاز الذي استخدمه ووقته (NULL = لم يُستخدم بعد)
+# - activations: الجهاز ← الكود الذي فُعّل به
+# استخدام الكود تحديث شرطي واحد داخل معاملة، فلا يُستخدم الكود نفسه مرتين حتى مع طلبات متزامنة.
+# الملفات النصية القديمة (trial_users.txt و activation_codes.txt و activated.txt) تُستورد تلقائيًا،
+# ويبقى activation_codes.txt مصدر الأكواد الجديدة: يُعاد استيراده عند تغيّره، ويُحذف منه الكود عند استخدامه
+# فلا يعود الكود المستخدم صالحًا إن فُقدت قاعدة البيانات وأُعيد استيراد الملف.
+# الاستخدام: python laws_license.py stats | import-codes FILE
+# ----------------------------------------------------
+
+LICENSE_DB = "licenses.db"
+TRIAL_USERS_FILE = "trial_users.txt"
+ACTIVATED_FILE = "activated.txt"
+ACTIVATION_CODES_FILE = "activation_codes.txt"
+BUSY_TIMEOUT_MS = 5000  # انتظار القفل عند تزامن الكتابة بدل الفشل مباشرة
+LICENSE_LOGGER = logging.getLogger("laws_license")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    device_id TEXT PRIMARY KEY,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS codes (
+    code TEXT PRIMARY KEY,
+    redeemed_by TEXT,
+    redeemed_at REAL
+);
+CREATE TABLE IF NOT EXISTS activations (
+    device_id TEXT PRIMARY KEY,
+    code TEXT,
+    activated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+"""
+
+
+class LicenseStore:
+    """
+    واجهة السجل: اتصال SQLite لكل خيط (اتصالات sqlite3 لا تُشارك بين الخيوط)،
+    وكل كتابة معاملة قصيرة تبدأ بـ BEGIN IMMEDIATE.
+    """
+
+    def __init__(self, db_file=LICENSE_DB, codes_file=ACTIVATION_CODES_FILE,
+                 trial_users_file=TRIAL_USERS_FILE, activated_file=ACTIVATED_FILE):
+        self.db_file = db_file
+        self.codes_file = codes_file
+        self._local = threading.local()
+        self._connect().executescript(_SCHEMA)
+        self._import_legacy(trial_users_file, activated_file)
+        self.sync_codes()
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.db = db
+        return db
+
+    def _transaction(self):
+        return _Transaction(self._connect())
+
+    def _import_legacy(self, trial_users_file, activated_file):
+        """استيراد سجلات التجربة والتفعيل من الملفات النصية مرة واحدة (ما دام الملف لم يتغير)"""
+        if self._file_changed(trial_users_file):
+            rows = []
+            with open(trial_users_file, "r", newline="") as f:
+                for line, row in enumerate(csv.reader(f), 1):
+                    try:
+                        rows.append((row[0], float(row[1])))
+                    except (IndexError, ValueError):
+                        # سطر تالف في الملف القديم لا يمنع تشغيل التطبيق
+                        LICENSE_LOGGER.warning("تجاهل سطر غير صالح %d في %s: %r", line, trial_users_file, row)
+            with self._transaction() as db:
+                db.executemany("INSERT OR IGNORE INTO trials (device_id, started) VALUES (?, ?)", rows)
+                self._mark_imported(db, trial_users_file)
+        if self._file_changed(activated_file):
+            # التفعيل القديم كان للتثبيت كله، والتثبيت له جهاز واحد (device_id.txt)
+            with self._transaction() as db:
+                db.execute("INSERT OR IGNORE INTO activations (device_id, code, activated_at) VALUES (?, NULL, ?)",
+                           ("*", os.path.getmtime(activated_file)))
+                self._mark_imported(db, activated_file)
+
+    def _file_changed(self, path):
+        if not path or not os.path.exists(path):
+            return False
+        row = self._connect().execute("SELECT mtime FROM imports WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row is None or row[0] != os.path.getmtime(path)
+
+    def _mark_imported(self, db, path):
+        db.execute("INSERT OR REPLACE INTO imports (path, mtime) VALUES (?, ?)",
+                   (os.path.abspath(path), os.path.getmtime(path)))
+
+    def sync_codes(self):
+        """إضافة الأكواد الجديدة من ملف الأكواد إن تغيّر؛ الأكواد المستخدمة تبقى مستخدمة"""
+        if self._file_changed(self.codes_file):
+            with open(self.codes_file, "r") as f:
+                self.add_codes(f, source=self.codes_file)
+
+    def add_codes(self, codes, source=None):
+        """إضافة أكواد (سطر لكل كود)، وتُرجع عدد الأكواد الجديدة"""
+        rows = [(code.strip(),) for code in codes if code.strip()]
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO codes (code) VALUES (?)", rows)
+            added = db.total_changes - before
+            if source:
+                self._mark_imported(db, source)
+        return added
+
+    def trial_start(self, device_id):
+        row = self._connect().execute("SELECT started FROM trials WHERE device_id = ?", (device_id,)).fetchone()
+        return row[0] if row else None
+
+    def register_trial(self, device_id):
+        """بدء التجربة مرة واحدة لكل جهاز؛ تُرجع وقت البدء المسجل (الأول إن وُجد)"""
+        with self._transaction() as db:
+            db.execute("INSERT OR IGNORE INTO trials (device_id, started) VALUES (?, ?)", (device_id, time.time()))
+        return self.trial_start(device_id)
+
+    def is_activated(self, device_id):
+        row = self._connect().execute(
+            "SELECT 1 FROM activations WHERE device_id IN (?, '*') LIMIT 1", (device_id,)).fetchone()
+        return row is not None
+
+    def redeem(self, code, device_id):
+        """استخدام كود التفعيل للجهاز: ينجح مرة واحدة فقط لكل كود، وتُرجع True عند النجاح"""
+        code = code.strip()
+        if not code:
+            return False
+        self.sync_codes()
+        now = time.time()
+        with self._transaction() as db:
+            cur = db.execute(
+                "UPDATE codes SET redeemed_by = ?, redeemed_at = ? WHERE code = ? AND redeemed_by IS NULL",
+                (device_id, now, code))
+            if cur.rowcount != 1:
+                return False
+            db.execute("INSERT OR REPLACE INTO activations (device_id, code, activated_at) VALUES (?, ?, ?)",
+                       (device_id, code, now))
+            # داخل المعاملة نفسها: إن تعذر حذف الكود من الملف لا يُسجَّل استخدامه
+            if self._remove_code(code):
+                self._mark_imported(db, self.codes_file)
+        return True
+
+    def _remove_code(self, code):
+        """حذف كود من ملف الأكواد (استبدال الملف كاملًا)، وتُرجع True إن كان فيه"""
+        if not self.codes_file or not os.path.exists(self.codes_file):
+            return False
+        with open(self.codes_file, "r") as f:
+            lines = f.readlines()
+        kept = [line for line in lines if line.strip() != code]
+        if len(kept) == len(lines):
+            return False
+        directory, name = os.path.split(os.path.abspath(self.codes_file))
+        fd, tmp = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+        try:
+            with open(fd, "w") as f:
+                f.writelines(kept)
+            shutil.copymode(self.codes_file, tmp)
+            os.replace(tmp, self.codes_file)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return True
+
+    def stats(self):
+        queries = {
+            "trials": "SELECT COUNT(*) FROM trials",
+            "codes": "SELECT COUNT(*) FROM codes",
+            "codes_redeemed": "SELECT COUNT(*) FROM codes WHERE redeemed_by IS NOT NULL",
+            "activations": "SELECT COUNT(*) FROM activations",
+        }
+        db = self._connect()
+        return {name: db.execute(sql).fetchone()[0] for name, sql in queries.items()}
+
+
+class _Transaction:
+    """معاملة كتابة: BEGIN IMMEDIATE يحجز قفل الكتابة من البداية، ثم COMMIT أو ROLLBACK"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="laws_license", description="سجل التفعيل والفترة التجريبية")
+    parser.add_argument("--db", default=LICENSE_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="عدد التجارب والأكواد والتفعيلات")
+    p = sub.add_parser("import-codes", help="إضافة أكواد تفعيل من ملف (سطر لكل كود)")
+    p.add_argument("file")
+    args = parser.parse_args(argv)
+
+    store = LicenseStore(args.db)
+    if args.command == "import-codes":
+        with open(args.file, "r") as f:
+            print(store.add_codes(f))
+    else:
+        for key, value in store.stats().items():
+            print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,36 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from docx import Document
-import re
 import uuid
 import os
 import time
 import html
-import csv
-from io import BytesIO
+import json
+import hashlib
+import logging
+import tempfile
+import contextlib
+from array import array
+from laws_engine import (
+    INDEX_FILE,
+    LAWS_DIR,
+    LiveLawIndex,
+    NULL_TIMER,
+    QueryCache,
+    SamplingProfiler,
+    SearchTimer,
+    TIMINGS_LOGGER,
+    TOP_K_RESULTS,
+    article_results,
+    cached_search_article_ids,
+    iter_export_results,
+    iter_results_html,
+    law_name,
+    normalize_arabic_numbers,
+    split_keywords,
+    write_results_docx,
+    write_results_text,
+)
+from laws_license import LicenseStore
 
 # ----------------------------------------------------
 # إعدادات الصفحة الأساسية
@@ -46,11 +69,20 @@ mark.mark-soft {
 """, unsafe_allow_html=True)
 
 TRIAL_DURATION = 3 * 24 * 60 * 60  # 3 أيام
-TRIAL_USERS_FILE = "trial_users.txt"
 DEVICE_ID_FILE = "device_id.txt"
-ACTIVATED_FILE = "activated.txt"
-ACTIVATION_CODES_FILE = "activation_codes.txt"
-LAWS_DIR = "laws"
+RESULTS_PAGE_SIZE = 10  # عدد المواد المعروضة في كل صفحة من النتائج
+LAW_VIEW_PAGE_SIZE = 20  # عدد المواد المعروضة في كل نافذة من عارض القانون
+MORPHOLOGY_OPTIONS = {
+    None: "بدون (مطابقة النص)",
+    "stem": "بالجذع: عقد ← العقد، بعقده، عقدها",
+    "root": "بالجذر التقريبي: عقد ← العقود أيضًا",
+}
+EXPORTS_DIR = os.path.join(tempfile.gettempdir(), "yemen_laws_exports")  # ملفات التصدير المخزنة حسب بصمة البحث
+EXPORTS_MAX_FILES = 64
+TIMINGS_LOG_FILE = "search_timings.log"  # سجل أزمنة مراحل البحث: سطر JSON لكل عملية
+TIMINGS_ENABLED = os.environ.get("LAWS_TIMINGS") == "1"  # تفعيل القياس لكل المستخدمين
+ADMIN_KEY = os.environ.get("LAWS_ADMIN_KEY", "")  # لوحة التشخيص تظهر مع ?admin=<المفتاح>
+TIMINGS_HISTORY = 20
 
 def get_device_id():
     if os.path.exists(DEVICE_ID_FILE):
@@ -61,170 +93,426 @@ def get_device_id():
         f.write(new_id)
     return new_id
 
-def get_trial_start(device_id):
-    if not os.path.exists(TRIAL_USERS_FILE):
-        return None
-    with open(TRIAL_USERS_FILE, "r") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if row and row[0] == device_id:
-                return float(row[1])
-    return None
+@st.cache_resource
+def _license_store():
+    # سجل واحد للعملية كلها؛ كل خيط (جلسة) يفتح اتصاله الخاص بقاعدة البيانات
+    return LicenseStore()
 
-def register_trial(device_id):
-    if not os.path.exists(TRIAL_USERS_FILE):
-        with open(TRIAL_USERS_FILE, "w", newline='') as f:
-            pass
-    with open(TRIAL_USERS_FILE, "a", newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([device_id, time.time()])
+def license_status(device_id):
+    """
+    حالة الترخيص ("activated" أو "trial" مع وقت بدء التجربة، أو None) محفوظة في الجلسة:
+    لا يُسأل السجل مع كل تفاعل، بل عند أول زيارة أو بعد انتهاء التجربة المحفوظة.
+    """
+    cached = st.session_state.get("license_status")
+    if cached and (cached[0] == "activated" or time.time() - cached[1] < TRIAL_DURATION):
+        return cached
+    store = _license_store()
+    if store.is_activated(device_id):
+        status = ("activated", None)
+    else:
+        trial_start = store.trial_start(device_id)
+        status = ("trial", trial_start) if trial_start is not None else (None, None)
+    if status[0]:
+        st.session_state.license_status = status
+    return status
 
-def is_activated():
-    return os.path.exists(ACTIVATED_FILE)
+def register_trial(device_id):
+    st.session_state.license_status = ("trial", _license_store().register_trial(device_id))
 
-def activate_app(code):
-    if not os.path.exists(ACTIVATION_CODES_FILE):
+def activate_app(code, device_id):
+    if not _license_store().redeem(code, device_id):
         return False
-    with open(ACTIVATION_CODES_FILE, "r") as f:
-        codes = [line.strip() for line in f.readlines()]
-    if code in codes:
-        codes.remove(code)
-        with open(ACTIVATION_CODES_FILE, "w") as f:
-            for c in codes:
-                f.write(c + "\n")
-        with open(ACTIVATED_FILE, "w") as f:
-            f.write("activated")
-        return True
-    return False
-
-def highlight_keywords(text, keywords, normalized_keywords=None, exact_match=False):
+    st.session_state.license_status = ("activated", None)
+    return True
+
+def results_fingerprint(query, index_signature):
+    # بصمة الاستعلام: نفس البحث على نفس نسخة الفهرس يعطي نفس ملف التصدير
+    key = json.dumps([query, index_signature], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def _prune_exports():
+    entries = [e for e in os.scandir(EXPORTS_DIR) if e.is_file()]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for e in entries[EXPORTS_MAX_FILES:]:
+        try:
+            os.remove(e.path)
+        except OSError:
+            pass
+
+def export_results_file(index, ids, fingerprint, ext):
     """
-    تمييز الكلمات المطابقة تمامًا بعلامة <mark>
-    وتمييز الكلمات المطابقة جزئيًا (كلمة ضمن كلمة أخرى) بعلامة <mark class="mark-soft">
-    المطابقة الكلية: برتقالي - المطابقة الجزئية: أصفر
+    يبني ملف التصدير عند الطلب فقط من أرقام المواد، مادة بعد مادة على القرص، ويعيد استخدامه لنفس البصمة.
+    download_button يحوّل أي بيانات إلى bytes في ذاكرة الوسائط، فيُقرأ الملف الجاهز مرة واحدة هنا.
     """
-    if not keywords:
-        return text
+    path = os.path.join(EXPORTS_DIR, f"{fingerprint}.{ext}")
+    if not os.path.exists(path):
+        os.makedirs(EXPORTS_DIR, exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as out:
+            if ext == "docx":
+                write_results_docx(iter_export_results(index, ids), out)
+            else:
+                write_results_text(iter_results_html(iter_export_results(index, ids)), out)
+        os.replace(tmp, path)
+        _prune_exports()
+    with open(path, "rb") as f:
+        return f.read()
+
+@st.cache_resource(show_spinner="جاري تحميل فهرس القوانين...")
+def _live_law_index():
+    # فهرس واحد للقراءة فقط تتشاركه كل الجلسات، يراقب مجلد القوانين
+    # ويعيد فهرسة الملف المتغير فقط عند إضافته أو تعديله أو حذفه.
+    # الفهرس مفتوح بـ mmap من INDEX_FILE فلا يتوقف زمن التشغيل ولا الذاكرة على حجم المجموعة
+    return LiveLawIndex(LAWS_DIR, index_file=INDEX_FILE).start()
+
+
+@st.cache_resource
+def _query_cache():
+    # نتائج الاستعلامات المتكررة مشتركة بين كل الجلسات وتُفرغ عند تغيّر أي ملف قانون
+    return QueryCache()
+
+def get_law_index():
+    return _live_law_index().current
+
+@st.cache_resource
+def _timings_log_handler():
+    handler = logging.FileHandler(TIMINGS_LOG_FILE, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    TIMINGS_LOGGER.addHandler(handler)
+    TIMINGS_LOGGER.setLevel(logging.INFO)
+    TIMINGS_LOGGER.propagate = False
+    return handler
+
+def is_admin():
+    return bool(ADMIN_KEY) and st.query_params.get("admin") == ADMIN_KEY
+
+def start_timer(name):
+    # القياس اختياري: بدونه تمر المراحل عبر NULL_TIMER دون أي تكلفة
+    if TIMINGS_ENABLED or is_admin():
+        return SearchTimer(name)
+    return NULL_TIMER
+
+def finish_timer(timer):
+    if not timer.enabled:
+        return
+    _timings_log_handler()
+    history = st.session_state.setdefault("timings_history", [])
+    history.append(timer.log())
+    del history[:-TIMINGS_HISTORY]
+
+def render_debug_panel():
+    with st.sidebar.expander("🛠️ لوحة التشخيص", expanded=False):
+        index = get_law_index()
+        st.caption(f"الفهرس: {len(index.files)} قانون، {index.article_count} مادة")
+        if _live_law_index().last_error:
+            st.warning(f"⚠️ تعذر تحديث الفهرس من مجلد القوانين (يُعرض آخر فهرس سليم): {_live_law_index().last_error}")
+        st.caption("الذاكرة المؤقتة للاستعلامات: " + json.dumps(_query_cache().stats(), ensure_ascii=False))
+        st.checkbox("🧪 تشغيل المحلل مع كل بحث", key="profile_searches")
+        history = st.session_state.get("timings_history", [])
+        if history:
+            rows = []
+            for record in reversed(history):
+                row = {"العملية": record["name"], "الوقت": record["time"], "الإجمالي (ms)": record["total_ms"]}
+                row.update({f"{k} (ms)": v for k, v in record["stages"].items()})
+                row.update({k: str(v) for k, v in record["counters"].items()})
+                rows.append(row)
+            st.dataframe(rows, use_container_width=True)
+        else:
+            st.caption("لا توجد قياسات بعد.")
+        profile = st.session_state.get("last_profile")
+        if profile:
+            st.markdown("**آخر تحليل (أكثر الدوال استهلاكًا):**")
+            st.code("\n".join(f"{pct:5.1f}%  {n:5d}  {name}" for name, n, pct in profile["top"]), language=None)
+            st.download_button(
+                label="⬇️ المكدسات المطوية (flamegraph)",
+                data=profile["collapsed"],
+                file_name="laws_profile.folded",
+                mime="text/plain",
+                key="download_profile",
+            )
 
-    marked_spans = []
 
-    # أولاً: المطابقات التامة
-    for kw in keywords:
-        if not kw:
-            continue
-        for m in re.finditer(r'(?<!\w)' + re.escape(kw) + r'(?!\w)', text, re.IGNORECASE):
-            marked_spans.append((m.start(), m.end(), "exact"))
-
-    # ثانيًا: المطابقات الجزئية (وليس التامة)
-    if normalized_keywords:
-        normalized_text = normalize_arabic_text(text)
-        for i, norm_kw in enumerate(normalized_keywords):
-            if not norm_kw:
-                continue
-            original_kw = keywords[i]
-            if not exact_match:
-                for m in re.finditer(re.escape(original_kw), text, re.IGNORECASE):
-                    overlap = False
-                    for s, e, t in marked_spans:
-                        if not (m.end() <= s or m.start() >= e):
-                            overlap = True
-                            break
-                    if not overlap:
-                        marked_spans.append((m.start(), m.end(), "partial"))
-
-    if not marked_spans:
-        return text
-    marked_spans.sort(key=lambda x: x[0])
-
-    result = []
-    last_idx = 0
-    for s, e, t in marked_spans:
-        if s < last_idx:
-            continue  # تجاوز التداخلات
-        result.append(text[last_idx:s])
-        span_text = text[s:e]
-        if t == "exact":
-            result.append(f"<mark>{span_text}</mark>")  # برتقالي
-        else:
-            result.append(f"<mark class=\"mark-soft\">{span_text}</mark>")  # أصفر
-        last_idx = e
-    result.append(text[last_idx:])
-    return "".join(result)
-
-def export_results_to_word(results, filename="نتائج_البحث.docx"):
-    from docx import Document
-    document = Document()
-    document.add_heading('نتائج البحث في القوانين اليمنية', level=1)
-    if not results:
-        document.add_paragraph("لم يتم العثور على نتائج للكلمات المفتاحية المحددة.")
-    else:
-        for i, r in enumerate(results):
-            document.add_heading(f"القانون: {r['law']} - المادة: {r['num']}", level=2)
-            document.add_paragraph(r['plain'])
-            if i < len(results) - 1:
-                document.add_page_break()
-    buffer = BytesIO()
-    document.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-def normalize_arabic_numbers(text):
-    arabic_to_english = str.maketrans('٠١٢٣٤٥٦٧٨٩', '0123456789')
-    return text.translate(arabic_to_english)
-
-def normalize_arabic_text(text):
-    text = re.sub(r'(.)\1{2,}', r'\1', text)
-    text = re.sub(r'[\u064B-\u0652]', '', text)
-    text = re.sub('[إأآا]', 'ا', text)
-    text = re.sub('[ىي]', 'ي', text)
-    text = re.sub('[ة]', 'ه', text)
-    text = re.sub('ؤ', 'و', text)
-    text = re.sub('ئ', 'ي', text)
-    text = re.sub(r'[^\w\s]', '', text)
-    text = re.sub('\s+', ' ', text)
-    return text.strip()
+@st.cache_data(max_entries=64, show_spinner=False)
+def law_toc(_index, signature, file):
+    """أرقام مواد القانون بترتيبها (فهرس العارض)، تُبنى مرة لكل قانون ولكل نسخة من الفهرس (signature)"""
+    return [_index.article(aid)[1] for aid in _index.article_ids([file])]
+
+def _reset_law_view():
+    st.session_state.law_view_start = 0
+
+def _move_law_view(delta):
+    st.session_state.law_view_start = max(st.session_state.get("law_view_start", 0) + delta, 0)
+
+def _jump_law_view(key):
+    st.session_state.law_view_start = st.session_state[key]
+
+def render_law_view_navigation(start, count, position):
+    nav = st.columns([1, 2, 1])
+    with nav[0]:
+        st.button("التالي ⬅️", key=f"law_view_next_{position}", disabled=start + LAW_VIEW_PAGE_SIZE >= count,
+                  on_click=_move_law_view, args=(LAW_VIEW_PAGE_SIZE,), use_container_width=True)
+    with nav[1]:
+        end = min(start + LAW_VIEW_PAGE_SIZE, count)
+        st.markdown(f"<div style='text-align:center;direction:rtl;'>المواد {start + 1} - {end} من {count}</div>", unsafe_allow_html=True)
+    with nav[2]:
+        st.button("➡️ السابق", key=f"law_view_prev_{position}", disabled=start <= 0,
+                  on_click=_move_law_view, args=(-LAW_VIEW_PAGE_SIZE,), use_container_width=True)
 
 def render_law_file_viewer(files):
+    """
+    عرض القانون على نوافذ من LAW_VIEW_PAGE_SIZE مادة من الفهرس المشترك بدل إرسال نصه كاملًا:
+    فهرس بأرقام المواد للانتقال إلى أي مادة، والنص الكامل يُبنى فقط عند تحميله.
+    """
     st.markdown("<h4 style='text-align:center;'>اختر القانون الذي تريد تصفحه بالكامل:</h4>", unsafe_allow_html=True)
-    law_sel = st.selectbox("اختر القانون:", files, key="law_select_for_view")
+    law_sel = st.selectbox("اختر القانون:", files, key="law_select_for_view", on_change=_reset_law_view)
     if law_sel:
-        doc = Document(os.path.join(LAWS_DIR, law_sel))
+        timer = start_timer("viewer")
+        index = get_law_index()
+        with timer.stage("toc"):
+            ids = index.article_ids([law_sel])
+            toc = law_toc(index, index.signature, law_sel)
         st.markdown(f"<h5 style='text-align:center;color:#1976d2'>{law_sel.replace('.docx','')}</h5>", unsafe_allow_html=True)
-        law_text = ""
-        for para in doc.paragraphs:
-            txt = para.text.strip()
-            if txt:
-                law_text += txt + "\n\n"
+        if not ids:
+            st.warning(f"⚠️ تعذر قراءة الملف {law_sel}: {index.errors.get(law_sel, '')}. يرجى التأكد من أنه ملف DOCX صالح.")
+            finish_timer(timer)
+            return
+        start = min(st.session_state.get("law_view_start", 0), len(ids) - 1)
+        st.session_state.law_view_start = start
+        timer.count("law", law_sel)
+        timer.count("articles", len(ids))
+
+        tools = st.columns([3, 1])
+        with tools[0]:
+            jump_key = f"law_view_jump_{law_sel}"
+            st.selectbox(
+                "الانتقال إلى المادة:", range(len(toc)), key=jump_key,
+                format_func=lambda i: f"المادة ({toc[i]})",
+                on_change=_jump_law_view, args=(jump_key,),
+            )
+        with tools[1]:
+            st.download_button(
+                label="⬇️ تحميل نص القانون",
+                data=lambda: index.law_text(law_sel),
+                file_name=f"{law_sel.replace('.docx', '')}.txt",
+                mime="text/plain",
+                key="law_view_download",
+                use_container_width=True,
+            )
         st.markdown("""
         <style>
-        textarea[disabled], .stTextArea textarea[disabled] {
-            color: #000 !important;
-            background: #fff !important;
-            opacity: 1 !important;
-            filter: none !important;
-            font-size: 19px !important;
-            font-family: "Tahoma", "Arial", sans-serif !important;
-            font-weight: bold !important;
+        .law-view-article {
+            direction: rtl;
+            text-align: right;
+            color: #000;
+            background: #fff;
+            font-size: 19px;
+            font-family: "Tahoma", "Arial", sans-serif;
+            font-weight: bold;
             letter-spacing: 0.3px;
+            line-height: 1.9;
+            padding: 10px 14px;
+            border-bottom: 1px solid #e0e0e0;
         }
-        textarea::-webkit-textfield-decoration-container {
-            display: none !important;
-        }
-        textarea::-webkit-scrollbar-button,
-        textarea::-webkit-scrollbar-corner {
-            display: none !important;
-        }
-        textarea::selection { background: #b3d7ff; }
-        textarea[readonly]::-moz-selection,
-        textarea[disabled]::-moz-selection {
-            background: #b3d7ff;
-        }
-        textarea[disabled]::selection {
-            background: #b3d7ff;
-        }
+        .law-view-article::selection, .law-view-article *::selection { background: #b3d7ff; }
         </style>
         """, unsafe_allow_html=True)
-        st.text_area("القانون كامل:", law_text, height=550, key="full_law_view_text", disabled=True)
+        render_law_view_navigation(start, len(ids), "top")
+        with timer.stage("render"):
+            window = [index.article(aid)[2] for aid in ids[start:start + LAW_VIEW_PAGE_SIZE]]
+            st.markdown("".join(
+                "<div class='law-view-article'>" + html.escape(text).replace("\n", "<br>") + "</div>" for text in window
+            ), unsafe_allow_html=True)
+        timer.count("chars", sum(map(len, window)))
+        render_law_view_navigation(start, len(ids), "bottom")
+        finish_timer(timer)
+
+def _change_results_page(delta):
+    st.session_state.results_page += delta
+
+
+def render_results_pagination(page, pages, position):
+    nav = st.columns([1, 2, 1])
+    with nav[0]:
+        st.button("التالي ⬅️", key=f"results_next_{position}", disabled=page >= pages - 1,
+                  on_click=_change_results_page, args=(1,), use_container_width=True)
+    with nav[1]:
+        st.markdown(f"<div style='text-align:center;direction:rtl;'>الصفحة {page + 1} من {pages}</div>", unsafe_allow_html=True)
+    with nav[2]:
+        st.button("➡️ السابق", key=f"results_prev_{position}", disabled=page <= 0,
+                  on_click=_change_results_page, args=(-1,), use_container_width=True)
+
+
+def render_copy_component(page_results):
+    """
+    زر نسخ واحد لكل صفحة: إطار واحد يحمل نصوص مواد الصفحة فقط،
+    ويختار المستخدم المادة المراد نسخها (أو كل مواد الصفحة).
+    """
+    texts = [r["plain"] for r in page_results]
+    labels = [f"المادة ({r['num']}) من قانون {r['law']}" for r in page_results]
+    options = "".join(f'<option value="{i}">{html.escape(label)}</option>' for i, label in enumerate(labels))
+    texts_json = json.dumps(texts, ensure_ascii=False).replace("</", "<\\/")
+    components.html(f"""
+        <style>
+        .copy-bar {{
+            display: flex;
+            flex-direction: row-reverse;
+            align-items: center;
+            gap: 10px;
+            direction: rtl;
+            font-family: 'Cairo', 'Tajawal', sans-serif;
+        }}
+        .copy-bar select {{
+            flex: 1;
+            font-size: 16px;
+            padding: 8px;
+            border-radius: 8px;
+            direction: rtl;
+        }}
+        .copy-material-btn {{
+            display: inline-flex;
+            align-items: center;
+            gap: 10px;
+            background: linear-gradient(90deg, #1abc9c 0%, #2980b9 100%);
+            color: #fff;
+            border: none;
+            border-radius: 30px;
+            font-size: 18px;
+            font-family: 'Cairo', 'Tajawal', sans-serif;
+            padding: 10px 22px;
+            cursor: pointer;
+            box-shadow: 0 4px 15px rgba(41, 128, 185, 0.4);
+            transition: all 0.3s ease;
+            direction: rtl;
+            white-space: nowrap;
+        }}
+        .copy-material-btn:hover {{
+            background: linear-gradient(90deg, #2980b9 0%, #1abc9c 100%);
+            box-shadow: 0 6px 20px rgba(41, 128, 185, 0.6);
+            transform: translateY(-2px);
+        }}
+        .copy-material-btn .copy-icon {{
+            font-size: 20px;
+            margin-left: 8px;
+            display: block;
+        }}
+        .copy-material-btn .copied-check {{
+            font-size: 20px;
+            color: #fff;
+            margin-left: 8px;
+            display: none;
+        }}
+        .copy-material-btn.copied .copy-icon {{
+            display: none;
+        }}
+        .copy-material-btn.copied .copied-check {{
+            display: inline;
+            animation: fadein-check 0.5s ease-out;
+        }}
+        @keyframes fadein-check {{
+            0% {{ opacity: 0; transform: scale(0.7); }}
+            100% {{ opacity: 1; transform: scale(1); }}
+        }}
+        </style>
+        <div class="copy-bar">
+            <select id="copy_select">
+                {options}
+                <option value="all">كل مواد هذه الصفحة</option>
+            </select>
+            <button class="copy-material-btn" id="copy_btn" onclick="copySelected()">
+                <span class="copy-icon">
+                    <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+                        <rect x="9" y="9" width="13" height="13" rx="2" ry="2"></rect>
+                        <path d="M5 15H4a2 2 0 0 1-2-2V4a2 2 0 0 1 2-2h9a2 2 0 0 1 2 2v1"></path>
+                    </svg>
+                </span>
+                <span>نسخ</span>
+                <span class="copied-check">
+                    <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+                        <polyline points="20 6 9 17 4 12"></polyline>
+                    </svg>
+                    تم النسخ!
+                </span>
+            </button>
+        </div>
+        <script>
+        var texts = {texts_json};
+        function copySelected() {{
+            var sel = document.getElementById('copy_select').value;
+            navigator.clipboard.writeText(sel === 'all' ? texts.join('\\n\\n') : texts[parseInt(sel)]);
+            var btn = document.getElementById('copy_btn');
+            btn.classList.add('copied');
+            setTimeout(function(){{
+                btn.classList.remove('copied');
+            }}, 1800);
+        }}
+        </script>
+    """, height=70)
+
+
+def run_search(index, query, timer=NULL_TIMER):
+    # الجلسة تحفظ أرقام المواد فقط، والنصوص تبقى في الفهرس المشترك
+    ids, total_matches = cached_search_article_ids(
+        _query_cache(), index, query["files"], query["keywords"], query["article"],
+        exact_match=query["exact_match"], rank=query["rank"], top_k=TOP_K_RESULTS, timer=timer,
+        boolean=query.get("boolean", False), morphology=query.get("morphology"), fuzzy=query.get("fuzzy", False))
+    st.session_state.search_query = query
+    st.session_state.result_ids = ids
+    st.session_state.results_signature = index.signature
+    st.session_state.total_matches = total_matches
+
+
+def current_result_ids(timer=NULL_TIMER):
+    """أرقام نتائج آخر بحث على الفهرس الحالي؛ إن تغيّر الفهرس منذ البحث يُعاد البحث نفسه عليه"""
+    index = get_law_index()
+    if st.session_state.get("results_signature") != index.signature:
+        run_search(index, st.session_state.search_query, timer)
+    return index, st.session_state.result_ids
+
+
+def citations_html(index, aid):
+    """
+    الإحالات من المادة وإليها من رسم الإحالات المحسوب مع الفهرس: كل مادة في details
+    يُفتح بنصها في المتصفح، فتتبع الإحالة لا يحتاج بحثًا جديدًا ولا إعادة تشغيل الصفحة.
+    """
+    sections = []
+    for label, refs in (("📎 تحيل إلى", index.cites(aid)), ("↩️ تحيل إليها", index.cited_by(aid))):
+        if not refs:
+            continue
+        items = "".join(
+            f'<details style="margin:4px 0;"><summary>المادة ({html.escape(num)}) من {html.escape(law_name(file))}</summary>'
+            f'<div style="padding:6px 12px;">{html.escape(text).replace(chr(10), "<br>")}</div></details>'
+            for file, num, text in map(index.article, refs)
+        )
+        sections.append(f'<div style="font-size:15px;margin-top:8px;"><b>{label}:</b>{items}</div>')
+    return "".join(sections)
+
+
+def render_results_page(index, ids, query):
+    """عرض صفحة واحدة من النتائج بحجم ثابت مهما كان عدد النتائج، والتمييز لمواد الصفحة فقط"""
+    pages = (len(ids) + RESULTS_PAGE_SIZE - 1) // RESULTS_PAGE_SIZE
+    page = min(max(st.session_state.get("results_page", 0), 0), pages - 1)
+    st.session_state.results_page = page
+    page_ids = ids[page * RESULTS_PAGE_SIZE:(page + 1) * RESULTS_PAGE_SIZE]
+    page_results = article_results(
+        index, page_ids,
+        query["keywords"], exact_match=query["exact_match"], boolean=query.get("boolean", False),
+        morphology=query.get("morphology"), fuzzy=query.get("fuzzy", False))
+    if pages > 1:
+        render_results_pagination(page, pages, "top")
+    render_copy_component(page_results)
+    for aid, r in zip(page_ids, page_results):
+        with st.expander(f"📚 المادة ({r['num']}) من قانون {r['law']}", expanded=True):
+            st.markdown(f'''
+            <div class="result-box-night">
+                <p style="font-size:17px;line-height:1.8;margin-top:0px;">
+                    {r["text"]}
+                </p>
+                {citations_html(index, aid)}
+            </div>
+            ''', unsafe_allow_html=True)
+    if pages > 1:
+        render_results_pagination(page, pages, "bottom")
+
 
 def run_main_app():
     with st.sidebar:
@@ -420,210 +708,125 @@ def run_main_app():
             advanced_search_col = st.columns([1, 2, 5])
             with advanced_search_col[2]:
                 exact_match = st.checkbox("تطابق تام للكلمة", key="exact_match_checkbox")
+                rank_results = st.checkbox(f"ترتيب حسب الأهمية (أفضل {TOP_K_RESULTS} نتيجة)", key="rank_results_checkbox")
+                boolean_query = st.checkbox(
+                    "استعلام منطقي (AND / OR / NOT)",
+                    key="boolean_query_checkbox",
+                    help='مثال: "المحكمة المختصة" AND دعوى NOT استئناف — أو بالعربية: و / أو / ليس. '
+                         'العبارة بين علامتي تنصيص تُطابق بكلمات كاملة، و دعوى NEAR/5 نيابة تعني بينهما 5 كلمات على الأكثر.',
+                )
+                morphology = st.selectbox(
+                    "البحث الصرفي",
+                    list(MORPHOLOGY_OPTIONS),
+                    format_func=MORPHOLOGY_OPTIONS.get,
+                    key="morphology_select",
+                    help="يطابق صيغ الكلمة الأخرى: مع أداة التعريف والحروف المتصلة والضمائر والجمع.",
+                )
+                fuzzy_search = st.checkbox(
+                    "بحث تقريبي (يتحمل الأخطاء الإملائية)",
+                    key="fuzzy_search_checkbox",
+                    help="يطابق الكلمات التي تختلف عن كلمة البحث بحرف واحد (أو حرفين في الكلمات الطويلة)، مثل الحظانة ← الحضانة.",
+                )
             search_btn_col = st.columns([1, 2, 12])
             with search_btn_col[2]:
                 submitted = st.form_submit_button("🔍 بدء البحث", use_container_width=True)
 
-        if "results" not in st.session_state:
-            st.session_state.results = []
+        if "result_ids" not in st.session_state:
+            st.session_state.result_ids = array("I")
         if "search_done" not in st.session_state:
             st.session_state.search_done = False
 
-        if submitted:
-            results = []
-            search_files = files if selected_file_form == "الكل" else [selected_file_form]
-            kw_list = [k.strip() for k in keywords_form.split(",") if k.strip()] if keywords_form else []
-            search_by_article = bool(article_number_input.strip())
-            normalized_kw_list = [normalize_arabic_text(kw) for kw in kw_list] if kw_list else []
-            norm_article = normalize_arabic_numbers(article_number_input.strip()) if search_by_article else ""
-
-            with st.spinner("جاري البحث في القوانين... قد يستغرق الأمر بعض الوقت."):
-                for file in search_files:
+        timer = start_timer("search" if submitted else "render")
+        # القياس يُسجَّل لكل بحث، حتى ما انتهى بخطأ في الاستعلام أو توقف قبل عرض النتائج
+        try:
+            if submitted:
+                search_files = files if selected_file_form == "الكل" else [selected_file_form]
+                query = {
+                    "files": search_files,
+                    "keywords": ([keywords_form.strip()] if keywords_form.strip() else []) if boolean_query else split_keywords(keywords_form),
+                    "article": normalize_arabic_numbers(article_number_input.strip()),
+                    "exact_match": exact_match,
+                    "rank": rank_results,
+                    "boolean": boolean_query,
+                    "morphology": morphology,
+                    "fuzzy": fuzzy_search,
+                }
+                profiling = is_admin() and st.session_state.get("profile_searches", False)
+                profiler = SamplingProfiler() if profiling else contextlib.nullcontext()
+
+                with st.spinner("جاري البحث في القوانين... قد يستغرق الأمر بعض الوقت."), profiler:
+                    with timer.stage("index"):
+                        index = get_law_index()
+                    for file in search_files:
+                        if file not in index.law_ranges:
+                            st.warning(f"⚠️ تعذر قراءة الملف {file}: {index.errors.get(file, '')}. يرجى التأكد من أنه ملف DOCX صالح.")
                     try:
-                        doc = Document(os.path.join(LAWS_DIR, file))
-                    except Exception as e:
-                        st.warning(f"⚠️ تعذر قراءة الملف {file}: {e}. يرجى التأكد من أنه ملف DOCX صالح.")
-                        continue
-                    law_name = file.replace(".docx", "")
-                    last_article = "غير معروفة"
-                    current_article_paragraphs = []
-                    for para in doc.paragraphs:
-                        txt = para.text.strip()
-                        if not txt:
-                            continue
-                        match = re.match(r"مادة\s*[\(]?\s*(\d+)[\)]?", txt)
-                        if match:
-                            if current_article_paragraphs:
-                                full_text = "\n".join(current_article_paragraphs)
-                                add_result = False
-                                simple_full_text = normalize_arabic_text(full_text)
-                                if search_by_article and normalize_arabic_numbers(last_article) == norm_article:
-                                    add_result = True
-                                elif normalized_kw_list:
-                                    for idx, kw in enumerate(normalized_kw_list):
-                                        if not kw:
-                                            continue
-                                        if exact_match:
-                                            pattern = r'(?<!\w)'+re.escape(kw)+r'(?!\w)'
-                                            if re.search(pattern, simple_full_text):
-                                                add_result = True
-                                                break
-                                        else:
-                                            if kw in simple_full_text:
-                                                add_result = True
-                                                break
-                                if add_result:
-                                    highlighted = highlight_keywords(full_text, kw_list, normalized_keywords=normalized_kw_list, exact_match=exact_match) if kw_list else full_text
-                                    results.append({
-                                        "law": law_name,
-                                        "num": last_article,
-                                        "text": highlighted,
-                                        "plain": full_text
-                                    })
-                                current_article_paragraphs = []
-                            last_article = match.group(1)
-                        current_article_paragraphs.append(txt)
-                    if current_article_paragraphs:
-                        full_text = "\n".join(current_article_paragraphs)
-                        add_result = False
-                        simple_full_text = normalize_arabic_text(full_text)
-                        if search_by_article and normalize_arabic_numbers(last_article) == norm_article:
-                            add_result = True
-                        elif normalized_kw_list:
-                            for idx, kw in enumerate(normalized_kw_list):
-                                if not kw:
-                                    continue
-                                if exact_match:
-                                    pattern = r'(?<!\w)'+re.escape(kw)+r'(?!\w)'
-                                    if re.search(pattern, simple_full_text):
-                                        add_result = True
-                                        break
-                                else:
-                                    if kw in simple_full_text:
-                                        add_result = True
-                                        break
-                        if add_result:
-                            highlighted = highlight_keywords(full_text, kw_list, normalized_keywords=normalized_kw_list, exact_match=exact_match) if kw_list else full_text
-                            results.append({
-                                "law": law_name,
-                                "num": last_article,
-                                "text": highlighted,
-                                "plain": full_text
-                            })
-            st.session_state.results = results
-            st.session_state.search_done = True
-            if not results:
-                st.info("لم يتم العثور على نتائج مطابقة للبحث.")
-
-        if st.session_state.get("search_done", False) and st.session_state.results:
-            st.markdown("<h2 style='text-align: center; color: #388E3C;'>نتائج البحث في القوانين 📚</h2>", unsafe_allow_html=True)
-            st.markdown("---")
-        if st.session_state.get("search_done", False):
-            results = st.session_state.results
-            unique_laws = sorted(set(r["law"] for r in results))
-            st.markdown('<div class="rtl-metric">', unsafe_allow_html=True)
-            st.metric(label="📊 إجمالي النتائج التي تم العثور عليها", value=f"{len(results)}", delta=f"في {len(unique_laws)} قانون/ملف")
-            st.markdown('</div>', unsafe_allow_html=True)
-            if results:
-                export_data = export_results_to_word(results)
-                st.markdown('<div class="rtl-download-btn">', unsafe_allow_html=True)
-                st.download_button(
-                    label="⬇️ تصدير النتائج إلى Word",
-                    data=export_data,
-                    file_name="نتائج_البحث_القوانين_اليمنية.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    key="download_button_word_main",
-                    use_container_width=False
-                )
+                        run_search(index, query, timer)
+                        query_error = None
+                    except ValueError as e:
+                        query_error = str(e)
+                        timer.count("error", query_error)
+                if profiling:
+                    st.session_state.last_profile = {"top": profiler.top(), "collapsed": profiler.collapsed()}
+                st.session_state.results_page = 0
+                st.session_state.search_done = query_error is None
+                if query_error:
+                    st.error(f"⚠️ {query_error}")
+                elif not st.session_state.result_ids:
+                    st.info("لم يتم العثور على نتائج مطابقة للبحث.")
+
+            if st.session_state.get("search_done", False) and st.session_state.result_ids:
+                st.markdown("<h2 style='text-align: center; color: #388E3C;'>نتائج البحث في القوانين 📚</h2>", unsafe_allow_html=True)
+                st.markdown("---")
+            if st.session_state.get("search_done", False):
+                index, ids = current_result_ids(timer)
+                query = st.session_state.search_query
+                unique_laws = {index.law_ids[aid] for aid in ids}
+                st.markdown('<div class="rtl-metric">', unsafe_allow_html=True)
+                st.metric(label="📊 إجمالي النتائج التي تم العثور عليها", value=f"{len(ids)}", delta=f"في {len(unique_laws)} قانون/ملف")
                 st.markdown('</div>', unsafe_allow_html=True)
-            else:
-                st.warning("لا توجد نتائج لتصديرها.")
-            st.markdown("---")
-            # تم إزالة فلترة النتائج حسب القانون، جميع النتائج تظهر مباشرة!
-            if results:
-                for i, r in enumerate(results):
-                    with st.expander(f"📚 المادة ({r['num']}) من قانون {r['law']}", expanded=True):
-                        st.markdown(f'''
-                        <div class="result-box-night">
-                            <p style="font-size:17px;line-height:1.8;margin-top:0px;">
-                                {r["text"]}
-                            </p>
-                        </div>
-                        ''', unsafe_allow_html=True)
-                        components.html(f"""
-                            <style>
-                            .copy-material-btn {{
-                                display: inline-flex;
-                                align-items: center;
-                                gap: 10px;
-                                background: linear-gradient(90deg, #1abc9c 0%, #2980b9 100%);
-                                color: #fff;
-                                border: none;
-                                border-radius: 30px;
-                                font-size: 18px;
-                                font-family: 'Cairo', 'Tajawal', sans-serif;
-                                padding: 10px 22px;
-                                cursor: pointer;
-                                box-shadow: 0 4px 15px rgba(41, 128, 185, 0.4);
-                                transition: all 0.3s ease;
-                                margin-bottom: 10px;
-                                direction: rtl;
-                                white-space: nowrap;
-                            }}
-                            .copy-material-btn:hover {{
-                                background: linear-gradient(90deg, #2980b9 0%, #1abc9c 100%);
-                                box-shadow: 0 6px 20px rgba(41, 128, 185, 0.6);
-                                transform: translateY(-2px);
-                            }}
-                            .copy-material-btn .copy-icon {{
-                                font-size: 20px;
-                                margin-left: 8px;
-                                display: block;
-                            }}
-                            .copy-material-btn .copied-check {{
-                                font-size: 20px;
-                                color: #fff;
-                                margin-left: 8px;
-                                display: none;
-                            }}
-                            .copy-material-btn.copied .copy-icon {{
-                                display: none;
-                            }}
-                            .copy-material-btn.copied .copied-check {{
-                                display: inline;
-                                animation: fadein-check 0.5s ease-out;
-                            }}
-                            @keyframes fadein-check {{
-                                0% {{ opacity: 0; transform: scale(0.7); }}
-                                100% {{ opacity: 1; transform: scale(1); }}
-                            }}
-                            </style>
-                            <button class="copy-material-btn" id="copy_btn_{i}_{r['law']}_{r['num']}" onclick="
-                                navigator.clipboard.writeText(document.getElementById('plain_text_{i}_{r['law']}_{r['num']}').innerText);
-                                var btn = document.getElementById('copy_btn_{i}_{r['law']}_{r['num']}');
-                                btn.classList.add('copied');
-                                setTimeout(function(){{
-                                    btn.classList.remove('copied');
-                                }}, 1800);
-                            ">
-                                <span class="copy-icon">
-                                    <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
-                                        <rect x="9" y="9" width="13" height="13" rx="2" ry="2"></rect>
-                                        <path d="M5 15H4a2 2 0 0 1-2-2V4a2 2 0 0 1 2-2h9a2 2 0 0 1 2 2v1"></path>
-                                    </svg>
-                                </span>
-                                <span>نسخ</span>
-                                <span class="copied-check">
-                                    <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
-                                        <polyline points="20 6 9 17 4 12"></polyline>
-                                    </svg>
-                                    تم النسخ!
-                                </span>
-                            </button>
-                            <div id="plain_text_{i}_{r['law']}_{r['num']}" style="display:none;">{html.escape(r['plain'])}</div>
-                        """, height=60)
-            else:
-                st.info("لا توجد نتائج لعرضها حاليًا. يرجى إجراء بحث جديد.")
+                total_matches = st.session_state.get("total_matches", len(ids))
+                if total_matches > len(ids):
+                    st.caption(f"تم عرض أفضل {len(ids)} نتيجة من أصل {total_matches} مادة مطابقة، مرتبة حسب الأهمية.")
+                if ids:
+                    # لا يُبنى ملف التصدير إلا عند الضغط على الزر
+                    fingerprint = results_fingerprint(query, index.signature)
+                    st.markdown('<div class="rtl-download-btn">', unsafe_allow_html=True)
+                    export_cols = st.columns([1, 1, 3])
+                    with export_cols[0]:
+                        st.download_button(
+                            label="⬇️ تصدير النتائج إلى Word",
+                            data=lambda: export_results_file(index, ids, fingerprint, "docx"),
+                            file_name="نتائج_البحث_القوانين_اليمنية.docx",
+                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                            key="download_button_word_main",
+                            use_container_width=False
+                        )
+                    with export_cols[1]:
+                        st.download_button(
+                            label="⬇️ تصدير النتائج إلى HTML",
+                            data=lambda: export_results_file(index, ids, fingerprint, "html"),
+                            file_name="نتائج_البحث_القوانين_اليمنية.html",
+                            mime="text/html",
+                            key="download_button_html_main",
+                            use_container_width=False
+                        )
+                    st.markdown('</div>', unsafe_allow_html=True)
+                else:
+                    st.warning("لا توجد نتائج لتصديرها.")
+                st.markdown("---")
+                # تم إزالة فلترة النتائج حسب القانون، جميع النتائج تظهر مباشرة!
+                if ids:
+                    with timer.stage("render"):
+                        render_results_page(index, ids, query)
+                else:
+                    st.info("لا توجد نتائج لعرضها حاليًا. يرجى إجراء بحث جديد.")
+        finally:
+            if submitted or st.session_state.get("search_done", False):
+                finish_timer(timer)
+
+    if is_admin():
+        render_debug_panel()
 
     with tabs[1]:
         if not os.path.exists(LAWS_DIR):
@@ -645,9 +848,11 @@ def render_header():
 
 def main():
     render_header()
-    device_id = get_device_id()
-    trial_start = get_trial_start(device_id)
-    if is_activated():
+    if "device_id" not in st.session_state:
+        st.session_state.device_id = get_device_id()
+    device_id = st.session_state.device_id
+    status, trial_start = license_status(device_id)
+    if status == "activated":
         run_main_app()
         return
     if trial_start is not None:
@@ -669,7 +874,7 @@ def main():
         st.markdown("<h3 style='text-align:center; color:#2c3e50;'>🔐 النسخة المدفوعة</h3>", unsafe_allow_html=True)
         code = st.text_input("أدخل كود التفعيل هنا:", key="activation_code_input", help="أدخل الكود الذي حصلت عليه لتفعيل النسخة الكاملة.")
         if st.button("✅ تفعيل الآن", key="activate_button", use_container_width=True):
-            if code and activate_app(code.strip()):
+            if code and activate_app(code.strip(), device_id):
                 st.success("✅ تم التفعيل بنجاح! يرجى إعادة تشغيل التطبيق لتطبيق التغييرات.")
                 st.stop()
             else:
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from laws_engine import LawIndex, MappedLawIndex, load_corpus, write_mapped_index  # noqa: E402
+
+LAWS_DIR = os.path.join(ROOT, "laws")
+
+
+@pytest.fixture(scope="session")
+def memory_index(tmp_path_factory):
+    """فهرس في الذاكرة على ملفات laws/ الفعلية، بملف مجمّع مؤقت لا يمس ملف التطبيق"""
+    corpus, errors = load_corpus(LAWS_DIR, str(tmp_path_factory.mktemp("corpus") / "corpus.json"), workers=1)
+    return LawIndex(corpus, errors)
+
+
+@pytest.fixture(scope="session")
+def mapped_index(memory_index, tmp_path_factory):
+    index_file = str(tmp_path_factory.mktemp("index") / "index.bin")
+    write_mapped_index(memory_index, index_file)
+    return MappedLawIndex(index_file)
+
+
+@pytest.fixture(params=["memory", "mapped"])
+def index(request):
+    return request.getfixturevalue(request.param + "_index")
@@ -0,0 +1,146 @@
+import random
+import re
+
+import pytest
+
+from bench_laws import legacy_normalize_arabic_text
+from laws_engine import (
+    article_citations,
+    light_stem,
+    match_query,
+    normalize_arabic_text,
+    normalize_arabic_texts,
+    parse_query,
+    search_article_ids,
+)
+
+
+# صيغ الإحالة وما يجب أن يُستخرج منها
+CITATION_CASES = [
+    ("وفقًا لأحكام المادة (37) من هذا القانون", ["37"]),
+    ("وفقًا لأحكام المادة رقم (37) من هذا القانون", ["37"]),
+    ("المادة رقم 12 والمادة رقم(13)", ["12", "13"]),
+    ("بالمادة رقم ١٢", ["12"]),
+    ("المواد أرقام (5، 6 و 7)", ["5", "6", "7"]),
+    ("المواد من 10 إلى 13", ["10", "11", "12", "13"]),
+    ("المواد من رقم 10 إلى رقم 13", ["10", "11", "12", "13"]),
+    ("المادتين 3 و 4", ["3", "4"]),
+    ("المادة رقم (4) من قانون المرافعات", []),
+    ("مادة رقم (5): يسري هذا القانون", []),
+]
+
+# أدوات التعريف مع الحروف المتصلة قبلها
+STEM_CASES = [
+    ("وبالعقد", "عقد"),
+    ("فبالعقد", "عقد"),
+    ("وكالعقد", "عقد"),
+    ("وللمحكمة", "محكم"),
+    ("فللمحكمة", "محكم"),
+    ("والمحكمة", "محكم"),
+    ("للمحكمة", "محكم"),
+]
+
+# كلمات صحيحة الإملاء: البحث التقريبي لا يُرجع أقل مما يُرجعه البحث العادي لها
+FUZZY_CASES = ["عقد", "حق", "الحضانة", "المحكمة", "المسؤولية", "بالتزاماته", "والاستئناف", "الشركات", "نفقة"]
+
+# استعلامات لمقارنة الفهرس الثنائي بفهرس الذاكرة: (الكلمات، خيارات search_article_ids)
+MAPPED_CASES = [
+    (["عقد"], {}),
+    (["المحكمة المختصة"], {"exact_match": True}),
+    (["عقد", "زوج", "طلاق"], {"rank": True}),
+    (["عقد AND بيع NOT إيجار"], {"boolean": True}),
+    (['"المحكمة المختصة" AND (دعوى OR طلب)'], {"boolean": True, "rank": True}),
+    (["الدعوى NEAR/5 النيابة"], {"boolean": True}),
+    (["العقود"], {"morphology": "root"}),
+    (["المحكمة"], {"morphology": "stem", "rank": True}),
+    (["الحظانة", "المسؤلية"], {"fuzzy": True}),
+    (["بباقيه"], {"fuzzy": True, "exact_match": True, "rank": True}),
+]
+
+_NORMALIZE_ALPHABET = list("اأإآىيةؤئوبتعقد ــً ٌ ٍ َ ُ ِ ّ ْ.,،؛!?\n\t  x1٢_😀\x00\x1c\x1f\x85 ") + ["\U00010400", "\U0001D7CE"]
+
+
+def _random_texts(count, length, seed=1):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(_NORMALIZE_ALPHABET) for _ in range(rng.randint(0, length))) for _ in range(count)]
+
+
+def test_normalize_matches_legacy(memory_index):
+    texts = [memory_index.article(aid)[2] for aid in range(memory_index.article_count)] + _random_texts(5000, 12)
+    expected = [legacy_normalize_arabic_text(t) for t in texts]
+    assert [normalize_arabic_text(t) for t in texts] == expected
+    assert normalize_arabic_texts(texts) == expected
+
+
+def test_normalize_texts_batches():
+    rng = random.Random(2)
+    for _ in range(2000):
+        texts = _random_texts(rng.randint(0, 5), 8, seed=rng.random())
+        assert normalize_arabic_texts(texts) == [legacy_normalize_arabic_text(t) for t in texts]
+
+
+@pytest.mark.parametrize("text, expected", CITATION_CASES)
+def test_article_citations(text, expected):
+    assert article_citations(text) == expected
+
+
+@pytest.mark.parametrize("word, expected", STEM_CASES)
+def test_light_stem_compound_articles(word, expected):
+    assert light_stem(normalize_arabic_text(word)) == expected
+
+
+def _has(text, word, exact):
+    if exact:
+        return re.search(r"(?<!\w)" + re.escape(word) + r"(?!\w)", text) is not None
+    return word in text
+
+
+def _near(text, first, second, distance):
+    tokens = text.split(" ")
+    return any(abs(i - j) - 1 <= distance
+               for i, a in enumerate(tokens) if a == first for j, b in enumerate(tokens) if b == second)
+
+
+N = normalize_arabic_text
+# (الاستعلام، المطابقة التامة، شرط المادة على نصها المطبّع)
+BOOLEAN_CASES = [
+    ("عقد AND بيع", False, lambda t: _has(t, N("عقد"), False) and _has(t, N("بيع"), False)),
+    ("عقد AND بيع", True, lambda t: _has(t, N("عقد"), True) and _has(t, N("بيع"), True)),
+    ("عقد NOT إيجار", False, lambda t: _has(t, N("عقد"), False) and not _has(t, N("إيجار"), False)),
+    ('"المحكمة المختصة"', False, lambda t: _has(t, N("المحكمة المختصة"), True)),
+    ("المحكمة المختصة", False, lambda t: _has(t, N("المحكمة المختصة"), False)),
+    ("حكمة المخ", False, lambda t: _has(t, N("حكمة المخ"), False)),
+    ("عقد, زوج", False, lambda t: _has(t, N("عقد"), False) or _has(t, N("زوج"), False)),
+    ("الدعوى NEAR/3 النيابة", False, lambda t: _near(t, N("الدعوى"), N("النيابة"), 3)),
+    ('"الدعوى" NEAR/0 "الجزائية"', False, lambda t: _near(t, N("الدعوى"), N("الجزائية"), 0)),
+    ("NOT عقد", False, lambda t: not _has(t, "عقد", False)),
+    ("(عقد OR بيع) AND NOT ثمن", False,
+     lambda t: (_has(t, "عقد", False) or _has(t, "بيع", False)) and not _has(t, "ثمن", False)),
+]
+
+
+@pytest.fixture(scope="module")
+def normalized_articles(memory_index):
+    return [normalize_arabic_text(memory_index.article(aid)[2]) for aid in range(memory_index.article_count)]
+
+
+@pytest.mark.parametrize("query, exact_match, predicate", BOOLEAN_CASES)
+def test_boolean_query_matches_brute_force(index, normalized_articles, query, exact_match, predicate):
+    expected = {aid for aid, text in enumerate(normalized_articles) if predicate(text)}
+    assert match_query(index, parse_query(query), exact_match=exact_match) == expected
+
+
+@pytest.mark.parametrize("keywords, options", MAPPED_CASES)
+def test_mapped_index_matches_memory(memory_index, mapped_index, keywords, options):
+    assert search_article_ids(mapped_index, keywords=keywords, **options) == \
+        search_article_ids(memory_index, keywords=keywords, **options)
+
+
+@pytest.mark.parametrize("word", FUZZY_CASES)
+@pytest.mark.parametrize("exact_match", [False, True])
+@pytest.mark.parametrize("rank", [False, True])
+def test_fuzzy_keeps_normal_hits(index, word, exact_match, rank):
+    options = {"exact_match": exact_match, "rank": rank, "top_k": index.article_count}
+    normal = set(search_article_ids(index, keywords=[word], **options)[0])
+    fuzzy = set(search_article_ids(index, keywords=[word], fuzzy=True, **options)[0])
+    assert normal <= fuzzy